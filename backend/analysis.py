@@ -0,0 +1,84 @@
+import hashlib
+import io
+import math
+import os
+import re
+from typing import List
+
+# Content statistics stored on BlogPost so list views never read `content`.
+# Post bodies are plain text with optional markdown-style "# Heading" lines
+# and ``` code fences.
+
+WORDS_PER_MINUTE = 200
+EXCERPT_LENGTH = int(os.getenv("EXCERPT_LENGTH", "280"))
+
+_WORD = re.compile(r"\S+")
+HEADING = re.compile(r"(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_SLUG_STRIP = re.compile(r"[^\w\s-]")
+_SLUG_SPACE = re.compile(r"[\s_-]+")
+
+
+def slugify(text: str) -> str:
+    return _SLUG_SPACE.sub("-", _SLUG_STRIP.sub("", text.lower())).strip("-") or "section"
+
+
+def unique_anchor(text: str, taken: set) -> str:
+    """Slug for a heading, numbered when an earlier heading already has it."""
+    anchor = base = slugify(text)
+    n = 1
+    while anchor in taken:
+        n += 1
+        anchor = f"{base}-{n}"
+    taken.add(anchor)
+    return anchor
+
+
+def _excerpt(parts: List[str]) -> str:
+    text = " ".join(parts)
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    cut = text.rfind(" ", 0, EXCERPT_LENGTH)
+    return text[:cut if cut > 0 else EXCERPT_LENGTH].rstrip(" ,.;:") + "…"
+
+
+def analyze(content: str) -> dict:
+    """Word count, reading time, excerpt, heading outline and SHA-256 of a post.
+
+    One pass over the lines of `content`; words are counted with a regex
+    iterator instead of splitting the whole text. The keys match BlogPost
+    columns.
+    """
+    digest = hashlib.sha256()
+    words = 0
+    outline = []
+    anchors = set()
+    excerpt_parts: List[str] = []
+    excerpt_size = 0
+    in_code = False
+
+    for line in io.StringIO(content):
+        digest.update(line.encode())
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_code = not in_code
+            continue
+        if not stripped:
+            continue
+        words += sum(1 for _ in _WORD.finditer(stripped))
+        if in_code:
+            continue
+        heading = HEADING.match(stripped)
+        if heading:
+            text = heading.group(2)
+            outline.append({"level": len(heading.group(1)), "text": text, "anchor": unique_anchor(text, anchors)})
+        elif excerpt_size <= EXCERPT_LENGTH:
+            excerpt_parts.append(" ".join(_WORD.findall(stripped)))
+            excerpt_size += len(excerpt_parts[-1]) + 1
+
+    return {
+        "word_count": words,
+        "reading_time": math.ceil(words / WORDS_PER_MINUTE),
+        "excerpt": _excerpt(excerpt_parts),
+        "outline": outline,
+        "content_hash": digest.hexdigest(),
+    }
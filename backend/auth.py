@@ -1,22 +1,45 @@
+import asyncio
+import hmac
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
+from events import event_hub
 from models import User
-from schemas import TokenData
+from schemas import TokenData, User as UserSnapshot
 from sqlalchemy.future import select
+import os
+import time
 
 # SECRET_KEY should be in env vars, hardcoded for demo
 SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+# Bearer token a metrics scraper can use instead of an admin login; unset means admins only
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Hashes with a different cost than BCRYPT_ROUNDS report needs_update and are rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Same scheme for public routes: a missing token is not an error
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -24,17 +47,133 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# bcrypt takes 100ms+ of CPU per call, so async handlers run it on a small
+# dedicated pool. Calls beyond the workers plus PASSWORD_HASH_MAX_QUEUE waiting
+# are refused with 503 instead of piling up.
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_stats = {"in_flight": 0, "completed": 0, "rejected": 0}
+
+async def _run_hash(fn, *args):
+    if _hash_stats["in_flight"] >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        _hash_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+    _hash_stats["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_stats["in_flight"] -= 1
+        _hash_stats["completed"] += 1
+
+async def hash_password(password: str) -> str:
+    return await _run_hash(pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify off the event loop; also returns a new hash when the stored cost is outdated."""
+    return await _run_hash(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def password_hash_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "queue_depth": max(0, _hash_stats["in_flight"] - PASSWORD_HASH_WORKERS),
+        **_hash_stats,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+# Verified tokens map to a detached snapshot of their user, so repeat requests
+# skip both jwt.decode and the user lookup. Entries expire with the token.
+# Claims in a token reflect the user when it was issued; invalidate_user makes
+# every worker re-read the user from the database for tokens issued before the
+# change. Admin-only routes re-check is_admin in the database regardless.
+_token_cache: "OrderedDict[str, Tuple[UserSnapshot, float]]" = OrderedDict()
+_user_tokens: Dict[int, set] = {}
+# When each user was last invalidated; claims in tokens issued before then are stale
+_invalidated_at: Dict[int, float] = {}
+USERS_TOPIC = "users"
+
+def invalidate_user(user_id: int):
+    """Drop cached sessions for a user, on every worker, after their row changes or is deleted.
+
+    Call it after committing the change, from a request or task on the event loop.
+    """
+    _forget_user(user_id, time.time())
+    event_hub.publish(USERS_TOPIC, {str(user_id): time.time()})
+
+def _forget_user(user_id: int, at: float):
+    _invalidated_at[user_id] = max(at, _invalidated_at.get(user_id, 0))
+    for token in _user_tokens.pop(user_id, ()):
+        _token_cache.pop(token, None)
+
+def _on_users_event(delta: dict):
+    if delta.get("resync"):
+        # Too many invalidations for one notice: forget every cached session
+        _token_cache.clear()
+        _user_tokens.clear()
+        return
+    for user_id, at in delta.items():
+        _forget_user(int(user_id), at)
+
+event_hub.listen(USERS_TOPIC, _on_users_event)
+
+def _cached_user(token: str) -> Optional[UserSnapshot]:
+    entry = _token_cache.get(token)
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if expires_at <= time.time():
+        _token_cache.pop(token, None)
+        return None
+    _token_cache.move_to_end(token)
+    return user
+
+def _cache_user(token: str, user: UserSnapshot, expires_at: float):
+    _token_cache[token] = (user, expires_at)
+    _user_tokens.setdefault(user.id, set()).add(token)
+    while len(_token_cache) > AUTH_CACHE_SIZE:
+        old_token, (old_user, _) = _token_cache.popitem(last=False)
+        tokens = _user_tokens.get(old_user.id)
+        if tokens is not None:
+            tokens.discard(old_token)
+            if not tokens:
+                del _user_tokens[old_user.id]
+
+def _user_from_claims(payload: dict) -> Optional[UserSnapshot]:
+    """Build the user from token claims, if the token carries them and is still current."""
+    user_id = payload.get("uid")
+    if user_id is None or "email" not in payload or "is_admin" not in payload:
+        return None
+    if payload.get("iat", 0) <= _invalidated_at.get(user_id, 0):
+        return None
+    return UserSnapshot(id=user_id, username=payload["sub"], email=payload["email"], is_admin=payload["is_admin"])
+
+def token_username(token: str) -> Optional[str]:
+    """Username of a validly signed, unexpired token, without a database lookup; None otherwise."""
+    user = _cached_user(token)
+    if user is not None:
+        return user.username
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> UserSnapshot:
+    user = _cached_user(token)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,15 +187,42 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    
-    result = await db.execute(select(User).where(User.username == token_data.username))
-    user = result.scalars().first()
-    
+
+    user = _user_from_claims(payload)
     if user is None:
-        raise credentials_exception
+        result = await db.execute(select(User).where(User.username == token_data.username))
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise credentials_exception
+        user = UserSnapshot.model_validate(db_user)
+
+    _cache_user(token, user, payload["exp"])
     return user
 
-async def get_current_admin_user(current_user: User = Depends(get_current_user)):
+async def get_optional_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme), db: AsyncSession = Depends(get_db)
+) -> Optional[UserSnapshot]:
+    """The viewer on public routes: None when anonymous or the token is not valid."""
+    if not token:
+        return None
+    try:
+        return await get_current_user(token, db)
+    except HTTPException:
+        return None
+
+async def get_current_admin_user(
+    current_user: UserSnapshot = Depends(get_current_user), db: AsyncSession = Depends(get_db)
+):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
+    # The token and cache may predate a demotion or deletion; admin rights come from the row
+    result = await db.execute(select(User.is_admin).where(User.id == current_user.id))
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=403, detail="Not authorized")
     return current_user
+
+async def get_operator(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """Guard for metrics and stats endpoints: METRICS_TOKEN or an admin's access token."""
+    if METRICS_TOKEN and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return None
+    return await get_current_admin_user(await get_current_user(token, db), db)
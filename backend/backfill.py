@@ -0,0 +1,77 @@
+"""Reprocess existing blog posts in batches on a process pool.
+
+    python backfill.py stats|render [--all] [--batch-size N] [--workers N]
+
+stats   word count, reading time, excerpt, outline and content hash
+render  HTML and table of contents, for posts rendered by another
+        renderer version
+
+By default only posts that were never processed are picked up; --all
+reprocesses every post. Posts are read in id order one batch at a time, the
+batch is spread over worker processes, and results are written back with a
+single executemany UPDATE per batch.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import or_, select, update
+
+from analysis import analyze
+from cache import response_cache
+from database import SessionLocal, engine
+from models import BlogPost
+from rendering import RENDER_VERSION, render
+
+# name -> (function of the post content run in a worker, filter for posts still pending)
+JOBS = {
+    "stats": (analyze, BlogPost.content_hash.is_(None)),
+    "render": (render, or_(BlogPost.render_version.is_(None), BlogPost.render_version != RENDER_VERSION)),
+}
+
+
+async def backfill(job: str, reprocess_all: bool = False, batch_size: int = 200, workers: int = None) -> int:
+    fn, pending = JOBS[job]
+    loop = asyncio.get_running_loop()
+    processed = 0
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            async with SessionLocal() as db:
+                query = select(BlogPost.id, BlogPost.content).where(BlogPost.id > last_id)
+                if not reprocess_all:
+                    query = query.where(pending)
+                result = await db.execute(query.order_by(BlogPost.id).limit(batch_size))
+                rows = result.all()
+                if not rows:
+                    break
+                values = await asyncio.gather(
+                    *(loop.run_in_executor(pool, fn, row.content or "") for row in rows)
+                )
+                await db.execute(update(BlogPost), [{"id": row.id, **v} for row, v in zip(rows, values)])
+                await db.commit()
+            # Only reaches other processes with the shared cache backend; memory caches expire by TTL
+            await response_cache.invalidate("blog:list", *(f"blog:{row.id}" for row in rows))
+            last_id = rows[-1].id
+            processed += len(rows)
+            print(f"{job}: {processed} post(s) processed, last id {last_id}")
+    return processed
+
+
+async def main(argv):
+    parser = argparse.ArgumentParser(description="Reprocess existing blog posts")
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("--all", action="store_true", help="reprocess posts that are already up to date")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+    processed = await backfill(args.job, args.all, args.batch_size, args.workers)
+    print(f"Done: {processed} post(s)")
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,80 @@
+"""Bytes saved and CPU spent compressing each route's response.
+
+    python -m bench.compression [--profile small] [--rounds 20] [--database-url URL]
+
+Run from backend/. Fetches each route's uncompressed body from the app
+in-process, then compresses it with every available encoding at the
+per-response level and at the level used for cached variants. The CPU
+column is per compression; cached routes pay the "stored" cost once per
+cache lifetime, the middleware pays the "response" cost on every request.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bench.run import configure, prepare
+
+
+def routes(info):
+    hot = info["hot_posts"][0]
+    return [
+        ("GET /blog/", "/blog/"),
+        ("GET /blog/?view=summary", "/blog/?view=summary&limit=100"),
+        ("GET /blog/{id}", f"/blog/{hot}"),
+        ("GET /blog/{id}/html", f"/blog/{hot}/html"),
+        ("GET /blog/{id}/comments", f"/blog/{hot}/comments?limit=100"),
+        ("GET /projects/", "/projects/"),
+        ("GET /search", "/search?q=python+cache"),
+        ("GET /tags/", "/tags/"),
+    ]
+
+
+def cpu_per_call(fn, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        fn()
+    return (time.process_time() - start) / rounds
+
+
+async def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Compression benchmark")
+    parser.add_argument("--profile", default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--database-url")
+    args = parser.parse_args(argv)
+
+    configure(args.database_url)
+    import httpx
+    import main as app_module
+    from compression import ENCODINGS, compress
+    from database import engine
+
+    try:
+        info = await prepare(args.profile, args.seed)
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            bodies = [
+                (label, (await client.get(url, headers={"Accept-Encoding": "identity"})).content)
+                for label, url in routes(info)
+            ]
+    finally:
+        await app_module.shutdown()
+        await engine.dispose()
+
+    print(f"{'route':<26} {'bytes':>9}  {'encoding':<8} {'mode':<8} {'bytes':>8} {'saved':>6} {'cpu':>9}")
+    for label, body in bodies:
+        for encoding in ENCODINGS:
+            for stored in (False, True):
+                compressed = compress(body, encoding, stored)
+                cpu = cpu_per_call(lambda: compress(body, encoding, stored), args.rounds)
+                print(
+                    f"{label:<26} {len(body):>9}  {encoding:<8} {'stored' if stored else 'response':<8} "
+                    f"{len(compressed):>8} {1 - len(compressed) / len(body):>6.0%} {cpu * 1000:>7.2f}ms"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
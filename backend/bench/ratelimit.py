@@ -0,0 +1,102 @@
+"""Per-request cost of the rate limit check.
+
+    python -m bench.ratelimit [--profile small] [--rounds 20000] [--requests 2000] [--database-url URL]
+
+Run from backend/. Times the limiter's dependency on its own, keyed by IP
+and by user (cached and uncached token), then sends POST /blog/{id}/clap
+through the app in-process with the limiter on and off. Clapping is the
+cheapest write, so it shows the check's share of a request at its largest.
+Limits are raised so that no request is refused.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bench.run import configure, prepare
+
+UNLIMITED = "1000000000/1"
+
+
+def request_for(headers: dict):
+    from starlette.requests import Request
+    return Request({
+        "type": "http", "method": "POST", "path": "/", "query_string": b"", "client": ("10.0.0.1", 0),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+async def per_check(check, request, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await check(request)
+    return (time.perf_counter() - start) / rounds
+
+
+async def per_request(client, url: str, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.post(url)
+        response.raise_for_status()
+    return (time.perf_counter() - start) / requests
+
+
+async def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Rate limit overhead benchmark")
+    parser.add_argument("--profile", default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args(argv)
+
+    os.environ["RATE_LIMIT_ENABLED"] = "true"
+    for name in ("CLAP", "LIKE"):
+        os.environ[f"RATE_LIMIT_{name}"] = UNLIMITED
+    configure(args.database_url)
+    import httpx
+    import auth
+    import main as app_module
+    from database import engine
+    from ratelimit import rate_limit, rate_limiter
+
+    token = auth.create_access_token({"sub": "bench", "uid": 1, "email": "bench@example.com", "is_admin": False})
+    checks = [
+        ("ip key", rate_limit("clap"), request_for({})),
+        ("user key, uncached token", rate_limit("like"), request_for({"Authorization": f"Bearer {token}"})),
+    ]
+    for label, check, request in checks:
+        print(f"{label:<26} {await per_check(check, request, args.rounds) * 1e6:8.2f}us per check")
+    # The token carries its claims, so this caches it without a database lookup
+    await auth.get_current_user(token, db=None)
+    label, check, request = "user key, cached token", *checks[1][1:]
+    print(f"{label:<26} {await per_check(check, request, args.rounds) * 1e6:8.2f}us per check")
+
+    try:
+        info = await prepare(args.profile, args.seed)
+        url = f"/blog/{info['hot_posts'][0]}/clap"
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await per_request(client, url, 50)  # First clap reads the post; later ones are buffered
+            timings = {}
+            # Alternate so drift in the process affects both sides alike
+            for _ in range(3):
+                for enabled in (False, True):
+                    rate_limiter.enabled = enabled
+                    elapsed = await per_request(client, url, args.requests)
+                    timings[enabled] = min(timings.get(enabled, elapsed), elapsed)
+    finally:
+        await app_module.shutdown()
+        await engine.dispose()
+
+    off, on = timings[False], timings[True]
+    print(
+        f"POST {url:<20} off {off * 1e6:8.1f}us  on {on * 1e6:8.1f}us  "
+        f"overhead {(on - off) * 1e6:+6.1f}us ({on / off - 1:+.1%})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,325 @@
+"""Benchmark the API in-process against a seeded database.
+
+    python -m bench.run [--scenario NAME ...] [--profile small|default|large]
+                        [--requests N] [--concurrency N] [--database-url URL]
+                        [--output results.json]
+                        [--save-baseline PATH] [--check PATH] [--threshold 0.25]
+                        [--track queries_per_request,p95_ms]
+
+Run from backend/ (needs httpx). Requests go through the real ASGI app with
+httpx's ASGITransport, so routing, middleware, caching and the database are
+all exercised, without a network in between. Without --database-url a
+temporary SQLite database is created and seeded; a given database is seeded
+only when it has no posts.
+
+Each scenario starts with an empty response cache and reports latency
+percentiles, throughput and SQL statements per request (from the metrics
+middleware). --save-baseline stores the tracked metrics; --check compares a
+run against a stored baseline and exits 1 when any tracked metric is worse
+by more than --threshold (a fraction). Latency baselines only mean something
+on the machine that recorded them; queries_per_request is portable, which is
+what bench/baseline.json tracks for CI:
+
+    python -m bench.run --check bench/baseline.json --track queries_per_request
+
+Metrics depend on the run's size (cache warm-up is spread over more requests
+in a longer run), so a baseline records the profile, requests, concurrency
+and seed it was made with. --check runs with those; passing a different
+value for one of them is an error.
+
+SQLite allows one writer at a time, so concurrent write scenarios (likes)
+report lock errors there; point --database-url at Postgres for those.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+SCENARIOS = ("list", "detail", "search", "likes", "claps", "login", "mixed")
+# Metrics where a larger value is an improvement
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+
+
+class Context:
+    """Shared state for one run: client, seeded ids, tokens and the samples being recorded."""
+
+    def __init__(self, client, info, tokens):
+        self.client = client
+        self.hot_posts = info["hot_posts"]
+        self.posts = info["posts"]
+        self.tokens = tokens
+        self.samples = {}
+        self.errors = 0
+
+    def post_id(self, rng) -> int:
+        # Four in five views go to the most popular posts
+        return rng.choice(self.hot_posts) if rng.random() < 0.8 else rng.randint(1, self.posts)
+
+    def auth(self, rng) -> dict:
+        return {"Authorization": f"Bearer {rng.choice(self.tokens)}"}
+
+    async def request(self, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.samples.setdefault(label, []).append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors += 1
+        return response
+
+
+# --- Traffic steps: each issues one request ---
+
+async def list_page(ctx, state, rng):
+    params = {"view": "summary", "limit": 20}
+    if state.get("cursor") and rng.random() < 0.7:
+        params["cursor"] = state["cursor"]
+    response = await ctx.request("blog list", "GET", "/blog/", params=params)
+    state["cursor"] = response.json().get("next_cursor") if response.status_code == 200 else None
+
+
+async def detail_view(ctx, state, rng):
+    blog_id = ctx.post_id(rng)
+    headers = ctx.auth(rng) if rng.random() < 0.3 else {}
+    if rng.random() < 0.75:
+        await ctx.request("blog detail", "GET", f"/blog/{blog_id}", headers=headers)
+    else:
+        await ctx.request("comment page", "GET", f"/blog/{blog_id}/comments", params={"limit": 20})
+
+
+async def search_query(ctx, state, rng):
+    from bench.seed import _WORDS
+    await ctx.request("search", "GET", "/search", params={"q": " ".join(rng.sample(_WORDS, 2))})
+
+
+async def like_toggle(ctx, state, rng):
+    await ctx.request("like", "POST", f"/blog/{rng.choice(ctx.hot_posts[:5])}/like", headers=ctx.auth(rng))
+
+
+async def clap(ctx, state, rng):
+    await ctx.request("clap", "POST", f"/blog/{rng.choice(ctx.hot_posts[:3])}/clap")
+
+
+async def login(ctx, state, rng):
+    from bench.seed import PASSWORD
+    await ctx.request("login", "POST", "/auth/login", data={"username": "admin", "password": PASSWORD})
+
+
+MIXES = {
+    "list": [(list_page, 1)],
+    "detail": [(detail_view, 1)],
+    "search": [(search_query, 1)],
+    "likes": [(like_toggle, 1)],
+    "claps": [(clap, 1)],
+    "login": [(login, 1)],
+    "mixed": [(list_page, 40), (detail_view, 35), (search_query, 6), (like_toggle, 10), (clap, 8), (login, 1)],
+}
+
+
+def _query_totals():
+    import metrics
+    queries = requests = 0
+    for counts, total in metrics.request_queries.series.values():
+        queries += total
+        requests += sum(counts)
+    return queries, requests
+
+
+async def run_scenario(ctx, name: str, requests: int, concurrency: int, seed: int) -> dict:
+    from cache import response_cache
+    await response_cache.backend.clear()
+    steps, weights = zip(*MIXES[name])
+    ctx.samples, ctx.errors = {}, 0
+    remaining = requests
+
+    async def worker(index: int):
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + index)
+        state = {}
+        while remaining > 0:
+            remaining -= 1
+            step = rng.choices(steps, weights)[0]
+            await step(ctx, state, rng)
+
+    queries_before, requests_before = _query_totals()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    queries_after, requests_after = _query_totals()
+
+    latencies = [value for values in ctx.samples.values() for value in values]
+    served = requests_after - requests_before
+    return {
+        "requests": len(latencies),
+        "errors": ctx.errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "queries_per_request": round((queries_after - queries_before) / served, 2) if served else 0.0,
+        "by_request": {
+            label: {"count": len(values), "p50_ms": round(percentile(values, 50) * 1000, 2),
+                    "p95_ms": round(percentile(values, 95) * 1000, 2)}
+            for label, values in sorted(ctx.samples.items())
+        },
+    }
+
+
+# Options that change what the metrics mean; stored with a baseline
+RUN_PARAMETERS = {"profile": "small", "requests": 1000, "concurrency": 16, "seed": 1}
+
+
+def apply_baseline_parameters(parser, args, baseline):
+    """Fill in run parameters: from the baseline being checked, else the defaults."""
+    recorded = (baseline or {}).get("parameters", {})
+    for name, default in RUN_PARAMETERS.items():
+        given = getattr(args, name)
+        if name in recorded:
+            if given is not None and given != recorded[name]:
+                parser.error(
+                    f"--{name} {given} differs from the {recorded[name]!r} the baseline was recorded with; "
+                    f"record a new baseline with --save-baseline to change it"
+                )
+            setattr(args, name, recorded[name])
+        elif given is None:
+            setattr(args, name, default)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Tracked metrics that are worse than the baseline by more than `threshold`."""
+    failures = []
+    for scenario, expected in baseline["scenarios"].items():
+        actual = results.get(scenario)
+        if actual is None:
+            continue
+        for metric, base in expected.items():
+            value = actual[metric]
+            if not base:
+                continue
+            change = (base - value) / base if metric in HIGHER_IS_BETTER else (value - base) / base
+            if change > threshold:
+                failures.append(f"{scenario}.{metric}: {value} vs baseline {base} ({change:+.0%})")
+    return failures
+
+
+def configure(database_url=None):
+    """Point the app at a scratch database and upload dir. Call before importing app modules."""
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.environ["DATABASE_URL"] = database_url or f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+    os.environ.setdefault("SLOW_REQUEST_MS", "10000")
+    # Warm-up would cache pages of the still-empty database
+    os.environ.setdefault("WARMUP_PATHS", "")
+    # Every scenario request comes from the same client
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+
+async def prepare(profile: str, seed_value: int):
+    """Run the app's startup and seed the database if it has no posts. Returns the seeded dataset info."""
+    # Imported only now: these modules read their configuration from the environment
+    from sqlalchemy import func, select
+    import main as app_module
+    import models
+    from auth import get_password_hash
+    from bench.seed import PASSWORD, PROFILES, seed
+    from database import engine
+
+    await app_module.startup()
+    async with engine.begin() as conn:
+        existing = (await conn.execute(select(func.count()).select_from(models.BlogPost))).scalar()
+        if existing:
+            return {"users": PROFILES[profile][0], "posts": existing, "hot_posts": list(range(1, min(existing, 20) + 1))}
+        print(f"Seeding profile {profile!r}...", file=sys.stderr)
+        return await seed(conn, profile, seed_value, get_password_hash(PASSWORD))
+
+
+async def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="In-process API benchmark")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS)
+    # Defaults in RUN_PARAMETERS; None tells an omitted option from an explicit one
+    parser.add_argument("--profile")
+    parser.add_argument("--requests", type=int)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--check")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--track", default="queries_per_request,p95_ms")
+    args = parser.parse_args(argv)
+
+    configure(args.database_url)
+    import httpx
+    import main as app_module
+    from auth import create_access_token
+    from database import engine
+
+    baseline = None
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+    apply_baseline_parameters(parser, args, baseline)
+
+    try:
+        info = await prepare(args.profile, args.seed)
+        rng = random.Random(args.seed)
+        tokens = [
+            create_access_token({"sub": f"user{uid}", "uid": uid, "email": f"user{uid}@example.com", "is_admin": False})
+            for uid in rng.sample(range(2, info["users"] + 1), min(50, info["users"] - 1))
+        ]
+
+        results = {}
+        # Unhandled exceptions become 500s and count as errors instead of aborting the run
+        transport = httpx.ASGITransport(app=app_module.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            ctx = Context(client, info, tokens)
+            # A check without --scenario runs the scenarios the baseline covers
+            for name in args.scenario or (list(baseline["scenarios"]) if baseline else ["mixed"]):
+                results[name] = await run_scenario(ctx, name, args.requests, args.concurrency, args.seed)
+                r = results[name]
+                print(
+                    f"{name:<8} {r['requests']:>6} req {r['errors']:>4} err {r['throughput_rps']:>8} req/s  "
+                    f"p50 {r['p50_ms']:>7}ms  p95 {r['p95_ms']:>7}ms  p99 {r['p99_ms']:>7}ms  "
+                    f"{r['queries_per_request']:>5} queries/req"
+                )
+                for label, stats in r["by_request"].items():
+                    print(f"    {label:<14} {stats['count']:>6}  p50 {stats['p50_ms']:>7}ms  p95 {stats['p95_ms']:>7}ms")
+    finally:
+        await app_module.shutdown()
+        await engine.dispose()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    tracked = [metric.strip() for metric in args.track.split(",") if metric.strip()]
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "parameters": {name: getattr(args, name) for name in RUN_PARAMETERS},
+                "scenarios": {name: {m: r[m] for m in tracked} for name, r in results.items()},
+            }, f, indent=2)
+            f.write("\n")
+    if baseline is not None:
+        failures = compare(results, baseline, args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,152 @@
+"""Seed a database with a realistic, reproducible dataset for benchmarks.
+
+Popularity is heavy-tailed: a few posts collect most likes and comments,
+and tag usage follows a Zipf-like curve. All randomness comes from one
+seeded generator, so the same profile always produces the same data.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import search
+from analysis import analyze
+from rendering import render
+
+PROFILES = {
+    # users, posts, projects, tags, likes, comments
+    "small": (200, 500, 100, 40, 5000, 3000),
+    "default": (1000, 3000, 500, 100, 40000, 20000),
+    "large": (5000, 20000, 2000, 300, 400000, 200000),
+}
+
+PASSWORD = "bench-password"
+
+_WORDS = (
+    "python fastapi async query index cache latency pool request model vector training data pipeline "
+    "deploy docker postgres react state render token cursor batch stream worker memory profile"
+).split()
+
+
+def _paragraphs(rng: random.Random, words: int) -> str:
+    lines = []
+    while words > 0:
+        n = min(words, rng.randint(20, 80))
+        lines.append(" ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + ".")
+        words -= n
+    return "\n".join(lines)
+
+
+def _content(rng: random.Random) -> str:
+    # Post length is log-normal: mostly short, a few very long
+    words = int(min(20000, rng.lognormvariate(6.3, 0.8)))
+    sections = max(1, words // 400)
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i + 1}")
+        parts.append(_paragraphs(rng, words // sections))
+        if rng.random() < 0.3:
+            parts.append("```python\nfor item in items:\n    process(item)\n```")
+    return "\n".join(parts)
+
+
+def _pareto_pick(rng: random.Random, n: int, alpha: float = 1.2) -> int:
+    """Index in [0, n) where low indexes are far more likely."""
+    return min(n - 1, int(rng.paretovariate(alpha)) - 1)
+
+
+async def seed(conn, profile: str = "default", seed: int = 1, password_hash: str = ""):
+    """Insert the dataset through `conn` (an AsyncConnection inside a transaction)."""
+    # ORM-enabled bulk statements: a list of dicts is one executemany, and
+    # update() with primary keys in the dicts updates row by row
+    db = AsyncSession(bind=conn)
+    n_users, n_posts, n_projects, n_tags, n_likes, n_comments = PROFILES[profile]
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+
+    await db.execute(insert(models.User), [
+        {"id": i, "username": "admin" if i == 1 else f"user{i}", "email": f"user{i}@example.com",
+         "hashed_password": password_hash, "is_admin": i == 1}
+        for i in range(1, n_users + 1)
+    ])
+    await db.execute(insert(models.Tag), [{"id": i, "name": f"tag{i}"} for i in range(1, n_tags + 1)])
+
+    posts = []
+    for i in range(1, n_posts + 1):
+        content = _content(rng)
+        posts.append({
+            "id": i, "title": f"Post {i}: " + " ".join(rng.choice(_WORDS) for _ in range(5)),
+            "subtitle": " ".join(rng.choice(_WORDS) for _ in range(10)), "content": content,
+            "created_at": start + timedelta(minutes=i * 37), "claps": 0, "owner_id": 1,
+            **analyze(content), **render(content),
+        })
+    await db.execute(insert(models.BlogPost), posts)
+
+    blog_tags = set()
+    for post_id in range(1, n_posts + 1):
+        for _ in range(rng.randint(1, 4)):
+            blog_tags.add((post_id, _pareto_pick(rng, n_tags) + 1))
+    await db.execute(insert(models.blog_tags), [{"blog_id": b, "tag_id": t} for b, t in blog_tags])
+
+    await db.execute(insert(models.Project), [
+        {"id": i, "title": f"Project {i}", "description": _paragraphs(rng, rng.randint(30, 300)),
+         "created_at": start + timedelta(hours=i * 11), "owner_id": 1, "project_url": None, "github_url": None}
+        for i in range(1, n_projects + 1)
+    ])
+
+    # Likes and comments: post ids are shuffled so popularity is not tied to age
+    post_rank = list(range(1, n_posts + 1))
+    rng.shuffle(post_rank)
+    likes = set()
+    for _ in range(n_likes):
+        likes.add((rng.randint(1, n_users), post_rank[_pareto_pick(rng, n_posts)]))
+    await db.execute(insert(models.BlogLike), [{"user_id": u, "blog_id": b} for u, b in likes])
+
+    comments = []
+    for i in range(1, n_comments + 1):
+        blog_id = post_rank[_pareto_pick(rng, n_posts)]
+        parent = comments[rng.randrange(len(comments))] if comments and rng.random() < 0.25 else None
+        if parent is not None:
+            blog_id = parent["blog_id"]
+        comments.append({
+            "id": i, "content": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 60))),
+            "created_at": start + timedelta(minutes=i * 13), "user_id": rng.randint(1, n_users),
+            "blog_id": blog_id, "parent_id": parent["id"] if parent is not None else None,
+        })
+    await db.execute(insert(models.BlogComment), comments)
+
+    project_likes = {(rng.randint(1, n_users), _pareto_pick(rng, n_projects) + 1) for _ in range(n_likes // 10)}
+    await db.execute(insert(models.ProjectLike), [{"user_id": u, "project_id": p} for u, p in project_likes])
+
+    # Denormalized counters, as the write paths would have maintained them
+    like_counts, comment_counts = {}, {}
+    for _, blog_id in likes:
+        like_counts[blog_id] = like_counts.get(blog_id, 0) + 1
+    for comment in comments:
+        comment_counts[comment["blog_id"]] = comment_counts.get(comment["blog_id"], 0) + 1
+    await db.execute(update(models.BlogPost), [
+        {"id": post_id, "likes_count": like_counts.get(post_id, 0), "claps": like_counts.get(post_id, 0),
+         "comments_count": comment_counts.get(post_id, 0)}
+        for post_id in range(1, n_posts + 1)
+    ])
+    project_counts = {}
+    for _, project_id in project_likes:
+        project_counts[project_id] = project_counts.get(project_id, 0) + 1
+    await db.execute(update(models.Project), [
+        {"id": project_id, "likes_count": count} for project_id, count in project_counts.items()
+    ])
+
+    await search.reindex_all(db)
+    await db.flush()
+    await db.close()
+
+    if conn.dialect.name == "postgresql":
+        # Ids were inserted explicitly; move the sequences past them
+        for table in ("users", "tags", "blog_posts", "projects", "blog_comments"):
+            await conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) FROM {table}"
+            ))
+
+    return {"users": n_users, "posts": n_posts, "projects": n_projects, "hot_posts": post_rank[:20]}
@@ -0,0 +1,87 @@
+"""CPU cost of serializing a page of posts: Pydantic validation vs the precompiled path.
+
+    python -m bench.serialization [--items 100] [--rounds 200]
+
+Run from backend/. Builds one page of full BlogPost rows (tags, comment
+previews, rendered HTML) in memory and times json_entry with and without
+fast=True, checking both produce the same bytes.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import cache
+import models
+import schemas
+from analysis import analyze
+from bench.seed import _content
+from cache import json_entry
+from rendering import render
+
+VIEWS = {
+    "full": List[schemas.BlogPost],
+    "summary": schemas.BlogPostSummaryPage,
+}
+
+
+def make_page(items: int, seed: int = 1):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    tags = [models.Tag(id=i, name=f"tag{i}") for i in range(1, 21)]
+    posts = []
+    for i in range(1, items + 1):
+        content = _content(rng)
+        post = models.BlogPost(
+            id=i, title=f"Post {i}", subtitle="A subtitle", content=content, image_url=None, image_variants=None,
+            created_at=start + timedelta(hours=i), owner_id=1, claps=rng.randint(0, 500),
+            likes_count=rng.randint(0, 500), comments_count=3, **analyze(content), **render(content),
+        )
+        post.tags = rng.sample(tags, 3)
+        post.latest_comments = [
+            {"id": i * 10 + n, "content": "Nice post", "created_at": start, "user_id": n,
+             "parent_id": None, "user": {"id": n, "username": f"user{n}"}}
+            for n in range(1, 4)
+        ]
+        posts.append(post)
+    return posts
+
+
+def cpu_per_call(schema, obj, rounds: int, fast: bool) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        json_entry(schema, obj, fast=fast)
+    return (time.process_time() - start) / rounds
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Serialization CPU benchmark")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+    if cache.orjson is None:
+        print("orjson is not installed; fast=True falls back to Pydantic")
+        return 1
+
+    posts = make_page(args.items)
+    for view, schema in VIEWS.items():
+        obj = posts if view == "full" else {"items": posts, "next_cursor": None}
+        slow_body = json_entry(schema, obj).body
+        fast_body = json_entry(schema, obj, fast=True).body
+        if slow_body != fast_body:
+            print(f"{view}: outputs differ")
+            return 1
+        slow = cpu_per_call(schema, obj, args.rounds, fast=False)
+        fast = cpu_per_call(schema, obj, args.rounds, fast=True)
+        print(
+            f"{view:<8} {args.items} items, {len(fast_body) / 1024:7.1f} KiB  "
+            f"pydantic {slow * 1000:6.2f}ms  fast {fast * 1000:6.2f}ms  "
+            f"saved {(1 - fast / slow):.0%} CPU"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from compression import COMPRESS_MIN_BYTES, add_vary, compress_async, negotiate, weak_etag
+from metrics import record_serialization
+from schemas import serializer
+
+try:
+    import orjson
+except ImportError:  # json_entry(fast=True) falls back to Pydantic
+    orjson = None
+
+# Response cache for read endpoints. Entries are the serialized JSON body plus
+# any headers the route sets, keyed by path + the query parameters the route
+# declares and tagged with the objects they were built from ("blog:list",
+# "blog:42", ...). Writes invalidate by tag, so only the affected pages are
+# dropped. Each invalidation also bumps the tag's generation; a body built
+# while one of its tags was invalidated is served but not stored, since it
+# may predate the write. Compressed copies of an entry are kept with it, one
+# per Accept-Encoding negotiated.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    expires_at: float = 0.0
+    refs: List[int] = field(default_factory=list) # Ids of the rows in the body, for per-viewer fields
+    variants: Dict[str, bytes] = field(default_factory=dict) # Content-Encoding -> compressed body
+
+
+class MemoryBackend:
+    """Per-process LRU with TTL and a byte budget over the stored bodies."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.tags: Dict[str, set] = {}
+        self.key_tags: Dict[str, tuple] = {}
+        self.generations: Dict[str, int] = {}
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry, tags: Iterable[str], ttl: int):
+        if len(entry.body) > self.max_bytes:
+            return
+        self._drop(key)
+        entry.expires_at = time.monotonic() + ttl
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        self.key_tags[key] = tags = tuple(tags)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+        while self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    async def get_variant(self, key: str, entry: CacheEntry, encoding: str) -> Optional[bytes]:
+        return entry.variants.get(encoding)
+
+    async def set_variant(self, key: str, entry: CacheEntry, encoding: str, body: bytes, ttl: int):
+        if self.entries.get(key) is not entry or encoding in entry.variants:
+            return
+        entry.variants[encoding] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    async def generation(self, tags: Iterable[str]) -> tuple:
+        return tuple(self.generations.get(tag, 0) for tag in tags)
+
+    async def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            self.generations[tag] = self.generations.get(tag, 0) + 1
+            for key in list(self.tags.get(tag, ())):
+                self._drop(key)
+
+    async def clear(self):
+        self.entries.clear()
+        self.tags.clear()
+        self.key_tags.clear()
+        self.size = 0
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.body) + sum(len(body) for body in entry.variants.values())
+        for tag in self.key_tags.pop(key, ()):
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class SharedBackend:
+    """Backend over a Redis-compatible asyncio client shared by all workers.
+
+    Only get/mget/set/delete/incr/sadd/smembers/expire are used, so tests
+    can pass any local stand-in with the same coroutine methods. Tag sets
+    are emptied by invalidate and otherwise expire with their newest entry.
+    """
+
+    def __init__(self, client, prefix: str = "respcache:"):
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        meta, _, body = raw.partition(b"\n")
+        meta = json.loads(meta)
+        return CacheEntry(body=body, etag=meta["etag"], headers=meta["headers"], refs=meta.get("refs", []))
+
+    async def set(self, key: str, entry: CacheEntry, tags: Iterable[str], ttl: int):
+        meta = json.dumps({"etag": entry.etag, "headers": entry.headers, "refs": entry.refs}).encode()
+        await self.client.set(self.prefix + key, meta + b"\n" + entry.body, ex=ttl)
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            await self.client.sadd(tag_key, key)
+            await self.client.expire(tag_key, ttl)
+
+    def _variant_key(self, key: str, entry: CacheEntry, encoding: str) -> str:
+        # Keyed by the body's ETag, so a variant can never outlive the body it was made from
+        return f"{self.prefix}{key}@{encoding}:{entry.etag}"
+
+    async def get_variant(self, key: str, entry: CacheEntry, encoding: str) -> Optional[bytes]:
+        return await self.client.get(self._variant_key(key, entry, encoding))
+
+    async def set_variant(self, key: str, entry: CacheEntry, encoding: str, body: bytes, ttl: int):
+        await self.client.set(self._variant_key(key, entry, encoding), body, ex=ttl)
+
+    async def generation(self, tags: Iterable[str]) -> tuple:
+        tags = list(tags)
+        if not tags:
+            return ()
+        return tuple(await self.client.mget(*(self.prefix + "gen:" + tag for tag in tags)))
+
+    async def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            # Bumped before the delete, so a build racing this write sees it when it finishes
+            await self.client.incr(self.prefix + "gen:" + tag)
+            tag_key = self.prefix + "tag:" + tag
+            keys = await self.client.smembers(tag_key)
+            names = [self.prefix + (k.decode() if isinstance(k, bytes) else k) for k in keys]
+            await self.client.delete(tag_key, *names)
+
+    async def clear(self):
+        pass
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: int = CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    async def serve(
+        self,
+        request: Request,
+        build: Callable[[], Awaitable[CacheEntry]],
+        tags: Iterable[str],
+        personalize: Optional[Callable[[CacheEntry], Awaitable[CacheEntry]]] = None,
+    ) -> Response:
+        """Serve the cached body for this request, building and storing it on a miss.
+
+        The stored entry is the same for every viewer. `personalize`, when
+        given, derives the viewer's copy from it (e.g. filling in is_liked).
+        Compressed bodies of the stored entry are cached with it; personalized
+        copies are compressed per response.
+        """
+        key = cache_key(request)
+        stored = await self.backend.get(key)
+        if stored is None:
+            self.misses += 1
+            tags = list(tags)
+            generation = await self.backend.generation(tags)
+            stored = await build()
+            if await self.backend.generation(tags) == generation:
+                await self.backend.set(key, stored, tags, self.ttl)
+            else:
+                self.discarded += 1
+        else:
+            self.hits += 1
+        entry = stored if personalize is None else await personalize(stored)
+
+        headers = {**entry.headers, "ETag": entry.etag}
+        encoding = None
+        if len(entry.body) >= COMPRESS_MIN_BYTES:
+            add_vary(headers, "Accept-Encoding")
+            encoding = negotiate(request.headers.get("accept-encoding", ""))
+        if encoding is not None:
+            headers["ETag"] = weak_etag(entry.etag)
+        if entry.etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(content=entry.body, media_type="application/json", headers=headers)
+
+        body = None
+        if entry is stored:
+            body = await self.backend.get_variant(key, entry, encoding)
+        if body is None:
+            body = await compress_async(entry.body, encoding, stored=entry is stored)
+            if entry is stored:
+                await self.backend.set_variant(key, entry, encoding, body, self.ttl)
+        headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, *tags: str):
+        await self.backend.invalidate(tags)
+
+    def stats(self) -> dict:
+        stats = {
+            "hits": self.hits, "misses": self.misses, "discarded": self.discarded, "evictions": self.backend.evictions
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats.update(entries=len(self.backend.entries), bytes=self.backend.size, max_bytes=self.backend.max_bytes)
+        return stats
+
+
+# id(route) -> query parameter names the route and its dependencies declare
+_route_params: Dict[int, frozenset] = {}
+
+
+def _declared_params(route) -> frozenset:
+    names = _route_params.get(id(route))
+    if names is None:
+        names, pending = set(), [route.dependant]
+        while pending:
+            dependant = pending.pop()
+            names.update(param.alias for param in dependant.query_params)
+            pending.extend(dependant.dependencies)
+        names = _route_params[id(route)] = frozenset(names)
+    return names
+
+
+def cache_key(request: Request) -> str:
+    """Path plus the route's declared query parameters; anything else cannot change the body."""
+    route = request.scope.get("route")
+    items = request.query_params.multi_items()
+    if route is not None and hasattr(route, "dependant"):
+        declared = _declared_params(route)
+        items = [(name, value) for name, value in items if name in declared]
+    return f"{request.url.path}?{urlencode(sorted(items))}"
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def entity_tag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def dumps(data) -> bytes:
+    """Compact JSON for plain data, matching Pydantic's output."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def json_entry(
+    schema, obj, headers: Optional[Dict[str, str]] = None, refs: Optional[List[int]] = None, fast: bool = False
+) -> CacheEntry:
+    """Serialize ORM rows as `schema` once into a cache entry.
+
+    By default the rows are validated through Pydantic first. With `fast`,
+    the schema's precompiled serializer reads them directly and orjson
+    encodes the result; routes opt in where the rows are known to be valid.
+    """
+    start = time.perf_counter()
+    if fast and orjson is not None:
+        body = dumps(serializer(schema)(obj))
+    else:
+        adapter = _adapter(schema)
+        body = adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+    record_serialization(time.perf_counter() - start)
+    return CacheEntry(body=body, etag=entity_tag(body), headers=headers or {}, refs=refs or [])
+
+
+def _make_backend():
+    if CACHE_BACKEND == "redis":
+        import redis.asyncio as redis
+        return SharedBackend(redis.from_url(CACHE_URL))
+    return MemoryBackend()
+
+
+response_cache = ResponseCache(_make_backend())
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import update
+
+from database import SessionLocal
+from models import BlogPost
+from cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+CLAP_FLUSH_INTERVAL = float(os.getenv("CLAP_FLUSH_INTERVAL", "1.0"))
+CLAP_FLUSH_THRESHOLD = int(os.getenv("CLAP_FLUSH_THRESHOLD", "1000"))
+
+
+class ClapBuffer:
+    """Write-behind accumulator for anonymous claps.
+
+    Claps are summed per post in memory and written as one
+    UPDATE blog_posts SET claps = claps + n per post, either every
+    `interval` seconds or as soon as `threshold` claps are pending.
+    """
+
+    def __init__(self, interval: float = CLAP_FLUSH_INTERVAL, threshold: int = CLAP_FLUSH_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.pending: Dict[int, int] = {}
+        self.pending_total = 0
+        # Last clap count read from the database, used to estimate the current total
+        self.known: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def is_known(self, blog_id: int) -> bool:
+        return blog_id in self.known
+
+    def remember(self, blog_id: int, claps: int):
+        self.known[blog_id] = claps
+
+    def forget(self, blog_id: int):
+        self.known.pop(blog_id, None)
+        self.pending_total -= self.pending.pop(blog_id, 0)
+
+    def estimate(self, blog_id: int, stored: int) -> int:
+        """Current total for a post given its stored count, counting pending claps."""
+        if blog_id not in self.known:
+            return stored
+        return self.known[blog_id] + self.pending.get(blog_id, 0)
+
+    def add(self, blog_id: int, n: int = 1) -> int:
+        """Record claps for a post the caller has already remembered; returns the estimated total."""
+        self.pending[blog_id] = self.pending.get(blog_id, 0) + n
+        self.pending_total += n
+        if self.pending_total >= self.threshold and not self._lock.locked():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        return self.known[blog_id] + self.pending[blog_id]
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            batch, self.pending, self.pending_total = self.pending, {}, 0
+            totals = {}
+            try:
+                async with SessionLocal() as db:
+                    # Ascending ids, so concurrent flushes from several workers lock rows in the same order
+                    for blog_id, n in sorted(batch.items()):
+                        result = await db.execute(
+                            update(BlogPost)
+                            .where(BlogPost.id == blog_id)
+                            .values(claps=BlogPost.claps + n)
+                            .returning(BlogPost.claps)
+                        )
+                        totals[blog_id] = result.scalar_one_or_none()
+                    await db.commit()
+            except Exception:
+                logger.exception("Failed to flush %d pending claps", sum(batch.values()))
+                for blog_id, n in batch.items():
+                    self.pending[blog_id] = self.pending.get(blog_id, 0) + n
+                    self.pending_total += n
+                return
+            for blog_id, claps in totals.items():
+                if claps is None:
+                    # Post was deleted while its claps were pending
+                    self.known.pop(blog_id, None)
+                else:
+                    self.known[blog_id] = claps
+        tags = ["blog:list"] + [f"blog:{blog_id}" for blog_id in batch]
+        await response_cache.invalidate(*tags)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+clap_buffer = ClapBuffer()
@@ -0,0 +1,105 @@
+import os
+from collections import defaultdict
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+import models
+from pagination import keyset_filter, next_cursor
+
+# Posts embed only their newest COMMENT_PREVIEW_SIZE top-level comments. Whole
+# threads are paged through comment_page, oldest first; replies are listed per
+# parent comment. Works for BlogComment and ProjectComment alike, given the
+# column that points at the post.
+
+COMMENT_PREVIEW_SIZE = int(os.getenv("COMMENT_PREVIEW_SIZE", "3"))
+
+
+async def attach_latest(db, comment_model, post_col, posts):
+    """Set `latest_comments` on every post in `posts` with one windowed query."""
+    if not posts or COMMENT_PREVIEW_SIZE <= 0:
+        return
+    rank = func.row_number().over(
+        partition_by=post_col,
+        order_by=(comment_model.created_at.desc(), comment_model.id.desc())
+    ).label("rank")
+    ranked = (
+        select(comment_model.id, rank)
+        .where(post_col.in_([post.id for post in posts]), comment_model.parent_id.is_(None))
+        .subquery()
+    )
+    result = await db.execute(
+        select(comment_model, models.User.id, models.User.username)
+        .join(ranked, ranked.c.id == comment_model.id)
+        .join(models.User, models.User.id == comment_model.user_id)
+        .where(ranked.c.rank <= COMMENT_PREVIEW_SIZE)
+        .order_by(comment_model.created_at, comment_model.id)
+    )
+    by_post = defaultdict(list)
+    for comment, user_id, username in result:
+        by_post[getattr(comment, post_col.key)].append({
+            "id": comment.id, "content": comment.content, "created_at": comment.created_at,
+            "user_id": comment.user_id, "parent_id": comment.parent_id,
+            "user": {"id": user_id, "username": username},
+        })
+    for post in posts:
+        post.latest_comments = by_post.get(post.id, [])
+
+
+async def check_parent(db, comment_model, post_col, post_id: int, parent_id: int):
+    """Reject a reply whose parent is missing or belongs to another post."""
+    result = await db.execute(
+        select(comment_model.id).where(comment_model.id == parent_id, post_col == post_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=400, detail="Parent comment not found")
+
+
+async def comment_page(db, comment_model, post_col, post_id: int, parent_id: Optional[int],
+                       cursor: Optional[str], limit: int) -> dict:
+    """One page of top-level comments (or of replies to `parent_id`), oldest first.
+
+    Authors are returned once each in `users` rather than nested per comment.
+    """
+    conditions = [post_col == post_id]
+    if parent_id is None:
+        conditions.append(comment_model.parent_id.is_(None))
+    else:
+        conditions.append(comment_model.parent_id == parent_id)
+    after = keyset_filter(comment_model.created_at, comment_model.id, cursor, descending=False)
+    if after is not None:
+        conditions.append(after)
+
+    result = await db.execute(
+        select(comment_model)
+        .where(*conditions)
+        .order_by(comment_model.created_at, comment_model.id)
+        .limit(limit + 1)
+    )
+    rows = result.scalars().all()
+    page = rows[:limit]
+    if not page:
+        return {"items": [], "users": {}, "next_cursor": None}
+
+    ids = [comment.id for comment in page]
+    result = await db.execute(
+        select(comment_model.parent_id, func.count())
+        .where(comment_model.parent_id.in_(ids))
+        .group_by(comment_model.parent_id)
+    )
+    reply_counts = dict(result.all())
+
+    result = await db.execute(
+        select(models.User.id, models.User.username)
+        .where(models.User.id.in_({comment.user_id for comment in page}))
+    )
+    users = {user_id: {"id": user_id, "username": username} for user_id, username in result}
+
+    items = [
+        {"id": comment.id, "content": comment.content, "created_at": comment.created_at,
+         "user_id": comment.user_id, "parent_id": comment.parent_id,
+         "reply_count": reply_counts.get(comment.id, 0)}
+        for comment in page
+    ]
+    return {"items": items, "users": users, "next_cursor": next_cursor(rows, limit)}
@@ -0,0 +1,170 @@
+import gzip
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+
+# Response compression negotiated from Accept-Encoding. Cached responses are
+# compressed by ResponseCache.serve, which keeps each encoding alongside the
+# entry so a hot page is compressed once per cache lifetime; everything else
+# (uncached routes, the HTML view) goes through CompressionMiddleware. Large
+# bodies are compressed in a worker thread to keep the event loop free.
+# Brotli and zstd are used when their packages are installed; gzip always is.
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Bodies at least this large are compressed off the event loop
+COMPRESS_OFFLOAD_BYTES = int(os.getenv("COMPRESS_OFFLOAD_BYTES", str(64 * 1024)))
+
+# (per-response level, level for bodies stored in the cache): stored
+# variants are compressed once, so they can afford a slower setting
+LEVELS = {"br": (4, 9), "zstd": (3, 9), "gzip": (6, 9)}
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Server preference, used to break ties between equally weighted encodings
+ENCODINGS = tuple(
+    name for name, available in (("br", brotli), ("zstd", zstandard), ("gzip", gzip)) if available is not None
+)
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header, or None for identity."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+# ZstdCompressor objects must not be shared between threads, and large bodies
+# are compressed on the threadpool, so each thread keeps its own per level
+_zstd_local = threading.local()
+
+
+def _zstd_compressor(level: int):
+    compressors = getattr(_zstd_local, "compressors", None)
+    if compressors is None:
+        compressors = _zstd_local.compressors = {}
+    compressor = compressors.get(level)
+    if compressor is None:
+        compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+    return compressor
+
+
+def compress(body: bytes, encoding: str, stored: bool = False) -> bytes:
+    level = LEVELS[encoding][stored]
+    if encoding == "br":
+        return brotli.compress(body, quality=level, mode=brotli.MODE_TEXT)
+    if encoding == "zstd":
+        return _zstd_compressor(level).compress(body)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+async def compress_async(body: bytes, encoding: str, stored: bool = False) -> bytes:
+    if len(body) >= COMPRESS_OFFLOAD_BYTES:
+        return await run_in_threadpool(compress, body, encoding, stored)
+    return compress(body, encoding, stored)
+
+
+def is_compressible(content_type: str) -> bool:
+    # Event streams are sent as they are produced and never buffered here
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith("text/event-stream")
+
+
+def add_vary(headers, value: str):
+    """Append `value` to a headers mapping's Vary."""
+    vary = headers.get("Vary")
+    if not vary:
+        headers["Vary"] = value
+    elif value.lower() not in vary.lower():
+        headers["Vary"] = f"{vary}, {value}"
+
+
+def weak_etag(etag: str) -> str:
+    # A compressed body is a different representation of the same content
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """Compresses single-message responses; streamed bodies pass through untouched."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept) if accept else None
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether compression applies
+                start_message = message
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not is_compressible(headers.get("content-type", ""))
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            add_vary(headers, "Accept-Encoding")
+            if encoding is not None:
+                body = await compress_async(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "etag" in headers:
+                    headers["ETag"] = weak_etag(headers["etag"])
+            passthrough = True
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+# Live interaction updates for the SSE streams at /blog/{id}/events and
+# /projects/{id}/events. Write paths publish deltas to a topic named like the
+# cache tags ("blog:42"): absolute counters ({"likes_count": 7}) and new
+# comments. Deltas are merged per topic before they reach the broker and
+# again per subscriber, so a busy post costs each client at most
+# EVENTS_MAX_RATE messages a second whatever the write rate, and a slow client
+# just receives bigger merged updates instead of a growing queue.
+#
+# The broker carries deltas between workers: "local" delivers within this
+# process, "postgres" uses LISTEN/NOTIFY so every uvicorn worker sees every
+# publish. In-process listeners get the same deltas, which lets per-worker
+# caches drop entries written on another worker.
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "local")
+EVENTS_MAX_RATE = float(os.getenv("EVENTS_MAX_RATE", "2"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000"))
+# Streams are closed after this long and the browser reconnects, which
+# rebalances clients across workers and bounds how long a drain can take
+EVENTS_MAX_AGE_SECONDS = float(os.getenv("EVENTS_MAX_AGE_SECONDS", "300"))
+# New comments carried in one update; beyond this the client is told to refetch
+COMMENTS_PER_EVENT = 20
+RETRY_MS = 3000
+
+
+def merge(into: dict, delta: dict):
+    """Fold `delta` into `into`: counters take the newest value, comments accumulate."""
+    for key, value in delta.items():
+        if key == "comments":
+            comments = into.setdefault("comments", [])
+            comments.extend(value)
+            if len(comments) > COMMENTS_PER_EVENT:
+                comments.clear()
+                into["resync"] = True
+        elif key == "resync":
+            into["resync"] = into.get("resync", False) or value
+        else:
+            into[key] = value
+
+
+def sse(data: dict, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}data: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class LocalBroker:
+    """Delivers publishes to this process only; enough for a single worker."""
+
+    async def start(self, deliver: Callable[[str, dict], None]):
+        self.deliver = deliver
+
+    async def publish(self, topic: str, delta: dict):
+        self.deliver(topic, delta)
+
+    async def stop(self):
+        pass
+
+
+class PostgresBroker:
+    """Fans out through LISTEN/NOTIFY on the primary database.
+
+    One dedicated asyncpg connection per worker listens and reconnects with
+    backoff if dropped (updates sent while it is down are missed; the next
+    one carries the current counters). Publishes use a pooled connection.
+    """
+
+    CHANNEL = "portfolio_events"
+    # NOTIFY payloads must stay under 8000 bytes
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, engine, url: str):
+        self.engine = engine
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[str, dict], None]):
+        self.deliver = deliver
+        self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        import asyncpg
+        delay = 1.0
+        while True:
+            try:
+                conn = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("Event listener cannot connect (%s); retrying in %.0fs", exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            delay = 1.0
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _: closed.set())
+            try:
+                await conn.add_listener(self.CHANNEL, self._on_notify)
+                await closed.wait()
+                logger.warning("Event listener connection lost; reconnecting")
+            finally:
+                if not conn.is_closed():
+                    await conn.close()
+
+    def _on_notify(self, conn, pid, channel, payload):
+        message = json.loads(payload)
+        self.deliver(message["topic"], message["delta"])
+
+    async def publish(self, topic: str, delta: dict):
+        payload = json.dumps({"topic": topic, "delta": delta}, separators=(",", ":"))
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            delta = {key: value for key, value in delta.items() if key != "comments"}
+            payload = json.dumps({"topic": topic, "delta": {**delta, "resync": True}}, separators=(",", ":"))
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            payload = json.dumps({"topic": topic, "delta": {"resync": True}}, separators=(",", ":"))
+        async with self.engine.begin() as conn:
+            await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.CHANNEL, "payload": payload})
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class Subscription:
+    __slots__ = ("topic", "pending", "wake")
+
+    def __init__(self, topic: str):
+        self.topic = topic
+        self.pending: dict = {}
+        self.wake = asyncio.Event()
+
+    def push(self, delta: dict):
+        merge(self.pending, delta)
+        self.wake.set()
+
+
+class EventHub:
+    def __init__(self, broker, max_rate: float = EVENTS_MAX_RATE):
+        self.broker = broker
+        self.interval = 1.0 / max_rate
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.listeners: Dict[str, List[Callable[[dict], None]]] = {}
+        self.subscriber_count = 0
+        self.published = 0
+        self.delivered = 0
+        self._outgoing: Dict[str, dict] = {}
+        self._last_sent: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._closing = asyncio.Event()
+
+    async def start(self):
+        self._closing.clear()
+        await self.broker.start(self._deliver)
+
+    def close_streams(self):
+        """End every open stream; clients reconnect (to another worker, when draining)."""
+        self._closing.set()
+        for subscriptions in self.subscribers.values():
+            for subscription in subscriptions:
+                subscription.wake.set()
+
+    async def stop(self):
+        self.close_streams()
+        for topic in list(self._outgoing):
+            self._flush(topic)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.broker.stop()
+
+    def publish(self, topic: str, delta: dict):
+        """Queue a delta for `topic`; never blocks the caller."""
+        self.published += 1
+        pending = self._outgoing.get(topic)
+        if pending is not None:
+            merge(pending, delta)
+            return
+        self._outgoing[topic] = {}
+        merge(self._outgoing[topic], delta)
+        loop = asyncio.get_running_loop()
+        delay = self._last_sent.get(topic, 0.0) + self.interval - loop.time()
+        if delay > 0:
+            loop.call_later(delay, self._flush, topic)
+        else:
+            self._flush(topic)
+
+    def _flush(self, topic: str):
+        delta = self._outgoing.pop(topic, None)
+        if delta is None:
+            return
+        loop = asyncio.get_running_loop()
+        self._last_sent[topic] = loop.time()
+        task = loop.create_task(self._send(topic, delta))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, topic: str, delta: dict):
+        try:
+            await self.broker.publish(topic, delta)
+        except Exception:
+            logger.exception("Failed to publish event for %s", topic)
+
+    def listen(self, topic: str, callback: Callable[[dict], None]):
+        """Call `callback` with every delta delivered for `topic`, from any worker."""
+        self.listeners.setdefault(topic, []).append(callback)
+
+    def _deliver(self, topic: str, delta: dict):
+        for callback in self.listeners.get(topic, ()):
+            try:
+                callback(delta)
+            except Exception:
+                logger.exception("Event listener failed for %s", topic)
+        for subscription in self.subscribers.get(topic, ()):
+            subscription.push(delta)
+            self.delivered += 1
+
+    def check_capacity(self):
+        # Also refused while closing, so draining workers do not take new streams
+        if self.subscriber_count >= EVENTS_MAX_SUBSCRIBERS or self._closing.is_set():
+            raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "30"})
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(topic)
+        self.subscribers.setdefault(topic, set()).add(subscription)
+        self.subscriber_count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscribers.get(subscription.topic)
+        if subscriptions is not None and subscription in subscriptions:
+            subscriptions.discard(subscription)
+            self.subscriber_count -= 1
+            if not subscriptions:
+                del self.subscribers[subscription.topic]
+
+    async def stream(self, topic: str, snapshot: dict):
+        """SSE body: the current state, then merged deltas at most EVENTS_MAX_RATE times a second."""
+        # Subscribed here rather than by the route, so a response that is never
+        # started cannot leave a subscription behind
+        subscription = self.subscribe(topic)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EVENTS_MAX_AGE_SECONDS
+        try:
+            event_id = 0
+            yield f"retry: {RETRY_MS}\n" + sse(snapshot, event_id)
+            while not self._closing.is_set():
+                timeout = min(EVENTS_HEARTBEAT_SECONDS, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(subscription.wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    if loop.time() >= deadline:
+                        break
+                    # Comment line; keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                subscription.wake.clear()
+                if not subscription.pending:
+                    continue
+                delta, subscription.pending = subscription.pending, {}
+                event_id += 1
+                yield sse(delta, event_id)
+                # Deltas arriving during the pause are merged into the next update
+                await asyncio.sleep(self.interval)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscriber_count,
+            "topics": len(self.subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+def _make_broker():
+    if EVENTS_BROKER == "postgres":
+        from database import DATABASE_URL, engine
+        return PostgresBroker(engine, DATABASE_URL)
+    return LocalBroker()
+
+
+event_hub = EventHub(_make_broker())
@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from sqlalchemy import update
+
+from database import SessionLocal
+from cache import response_cache
+from uploads import UPLOAD_DIR, upload_url
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WIDTHS = [int(w) for w in os.getenv("IMAGE_WIDTHS", "320,640,1024,1600").split(",")]
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "75"))
+PLACEHOLDER_WIDTH = 16
+
+_FORMATS = {"webp": "image/webp", "avif": "image/avif"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _supported_formats() -> List[str]:
+    from PIL import features
+    return [fmt for fmt in _FORMATS if features.check(fmt)]
+
+
+def render_variants(upload_dir: str, filename: str, widths: List[int], quality: int) -> dict:
+    """Write resized WebP/AVIF copies of an upload and return their metadata.
+
+    Runs in a worker process. Uploads are content-addressed, so variants that
+    already exist on disk are reused rather than re-encoded.
+    """
+    from PIL import Image, ImageOps
+
+    stem = filename.rsplit(".", 1)[0]
+    with Image.open(os.path.join(upload_dir, filename)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        width, height = image.size
+
+        targets = sorted({w for w in widths if w < width} | {width})
+        srcset = {}
+        for fmt in _supported_formats():
+            entries = []
+            for target in targets:
+                name = f"{stem}-{target}w.{fmt}"
+                path = os.path.join(upload_dir, name)
+                if not os.path.exists(path):
+                    resized = image if target == width else image.resize(
+                        (target, max(1, round(height * target / width))), Image.LANCZOS
+                    )
+                    tmp_path = path + ".part"
+                    resized.save(tmp_path, format=fmt.upper(), quality=quality)
+                    os.replace(tmp_path, path)
+                entries.append((name, target))
+            srcset[_FORMATS[fmt]] = entries
+
+        tiny = image.resize((PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))))
+        buffer = io.BytesIO()
+        tiny.save(buffer, format="WEBP", quality=30)
+        placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+    return {"width": width, "height": height, "placeholder": placeholder, "srcset": srcset}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+async def process_image(model, row_id: int, filename: str, *cache_tags: str):
+    """Background task: build variants for an uploaded image and store them on the row."""
+    try:
+        meta = await asyncio.get_running_loop().run_in_executor(
+            _get_executor(), render_variants, UPLOAD_DIR, filename, IMAGE_WIDTHS, IMAGE_QUALITY
+        )
+    except ImportError:
+        logger.warning("Pillow is not installed; skipping image variants for %s", filename)
+        return
+    except Exception:
+        logger.exception("Failed to build image variants for %s", filename)
+        return
+
+    meta["srcset"] = {
+        mime: ", ".join(f"{upload_url(name)} {width}w" for name, width in entries)
+        for mime, entries in meta["srcset"].items()
+    }
+    async with SessionLocal() as db:
+        await db.execute(update(model).where(model.id == row_id).values(image_variants=meta))
+        await db.commit()
+    await response_cache.invalidate(*cache_tags)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import signal
+import threading
+from typing import Callable, List
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+# Worker lifecycle: warm-up before the first request, the state behind the
+# /health probes, and a graceful drain on SIGTERM. The drain handler wraps
+# the server's own (uvicorn's) SIGTERM handler: readiness turns 503 at once,
+# and only after SHUTDOWN_DRAIN_SECONDS, once load balancers have stopped
+# routing here, are event streams ended and the server told to stop. The
+# server then finishes in-flight requests and runs the shutdown hooks, which
+# flush buffered claps and events.
+
+WARMUP_PATHS = [
+    path for path in os.getenv("WARMUP_PATHS", "/blog/?view=summary,/blog/,/projects/?view=summary,/tags/").split(",")
+    if path
+]
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "0"))
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.stopping = False
+
+
+state = Lifecycle()
+
+
+async def warm_pool(engine, connections: int = WARMUP_CONNECTIONS):
+    """Open `connections` pooled connections up front so the first requests do not pay for them."""
+
+    async def touch():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(touch() for _ in range(connections)))
+
+
+async def _get(app, path: str) -> int:
+    """GET `path` through the ASGI app in-process; returns the status code."""
+    url_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": url_path, "raw_path": url_path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"warmup")], "client": ("127.0.0.1", 0), "server": ("warmup", 80),
+    }
+    status = 500
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def warm_cache(app, paths: List[str] = WARMUP_PATHS):
+    """Build the response cache entries for the hottest pages before traffic arrives."""
+    for path in paths:
+        try:
+            status = await _get(app, path)
+        except Exception:
+            logger.exception("Warm-up request for %s failed", path)
+            continue
+        if status != 200:
+            logger.warning("Warm-up request for %s returned %d", path, status)
+
+
+async def database_ok(engine, timeout: float = READY_CHECK_TIMEOUT) -> bool:
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout)
+    except (asyncio.TimeoutError, OSError, DBAPIError):
+        return False
+    return True
+
+
+def install_drain_handler(on_stop: Callable[[], None]):
+    """Wrap the server's SIGTERM handler with a drain; `on_stop` runs just before the server stops.
+
+    Does nothing when SIGTERM has no Python handler (not under uvicorn) or
+    when not called from the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        return
+    loop = asyncio.get_running_loop()
+
+    def stop(sig, frame):
+        if state.stopping:
+            return
+        state.stopping = True
+        on_stop()
+        previous(sig, frame)
+
+    def handle_term(sig, frame):
+        if state.draining:
+            # Second SIGTERM: skip the rest of the delay
+            loop.call_soon_threadsafe(stop, sig, frame)
+            return
+        state.draining = True
+        logger.info("SIGTERM received; draining for %.0fs before shutdown", SHUTDOWN_DRAIN_SECONDS)
+        loop.call_soon_threadsafe(loop.call_later, SHUTDOWN_DRAIN_SECONDS, stop, sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
@@ -0,0 +1,113 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Dict, Iterable, Set, Tuple
+
+from sqlalchemy import select
+
+import models
+from cache import CacheEntry, dumps, entity_tag
+from events import event_hub
+
+# Per-viewer is_liked on top of the shared response cache. Cached bodies are
+# built without a viewer (is_liked false); for a signed-in viewer the ids on
+# the page are checked against their likes with one query for the ids not
+# already known, and the body is rewritten only if something is liked.
+#
+# A like toggle is written through on the worker that handled it and
+# published on the LIKES_TOPIC event topic; every other worker forgets what
+# it knew about that user's likes of that kind. With EVENTS_BROKER=local the
+# notice only reaches this process, so the TTL bounds how long another
+# worker can show a stale is_liked.
+
+LIKE_CACHE_USERS = int(os.getenv("LIKE_CACHE_USERS", "10000"))
+LIKE_CACHE_TTL = float(os.getenv("LIKE_CACHE_TTL", "60"))
+LIKES_TOPIC = "likes"
+
+_LIKES = {
+    "blog": (models.BlogLike, models.BlogLike.blog_id),
+    "project": (models.ProjectLike, models.ProjectLike.project_id),
+}
+
+
+class LikeCache:
+    """LRU over (kind, user_id) -> {post_id: liked} for the posts a user has viewed."""
+
+    def __init__(self, max_users: int = LIKE_CACHE_USERS, ttl: float = LIKE_CACHE_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.entries: "OrderedDict[Tuple[str, int], Tuple[float, Dict[int, bool]]]" = OrderedDict()
+
+    def known(self, kind: str, user_id: int) -> Dict[int, bool]:
+        key = (kind, user_id)
+        entry = self.entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry[0] <= now:
+            entry = (now + self.ttl, {})
+            self.entries[key] = entry
+            while len(self.entries) > self.max_users:
+                self.entries.popitem(last=False)
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def record(self, kind: str, user_id: int, post_id: int, liked: bool):
+        """Write-through after a like toggle in this process; tells the other workers."""
+        entry = self.entries.get((kind, user_id))
+        if entry is not None:
+            entry[1][post_id] = liked
+        event_hub.publish(LIKES_TOPIC, {f"{kind}:{user_id}": os.getpid()})
+
+    def on_event(self, delta: dict):
+        """Forget users whose likes changed on another worker; everyone on a resync."""
+        if delta.get("resync"):
+            self.entries.clear()
+            return
+        for key, pid in delta.items():
+            if pid != os.getpid():
+                kind, _, user_id = key.partition(":")
+                self.entries.pop((kind, int(user_id)), None)
+
+
+like_cache = LikeCache()
+event_hub.listen(LIKES_TOPIC, like_cache.on_event)
+
+
+async def liked_ids(db, kind: str, user_id: int, post_ids: Iterable[int]) -> Set[int]:
+    """Ids among `post_ids` the user has liked; queries only ids not cached yet."""
+    post_ids = list(post_ids)
+    known = like_cache.known(kind, user_id)
+    missing = [post_id for post_id in post_ids if post_id not in known]
+    if missing:
+        like_model, post_col = _LIKES[kind]
+        # Served by the (user_id, post) primary key
+        result = await db.execute(
+            select(post_col).where(like_model.user_id == user_id, post_col.in_(missing))
+        )
+        found = set(result.scalars())
+        for post_id in missing:
+            known[post_id] = post_id in found
+    return {post_id for post_id in post_ids if known.get(post_id)}
+
+
+def mark_liked(entry: CacheEntry, liked: Set[int]) -> CacheEntry:
+    """Copy of a cached post or post list with is_liked set for the given ids."""
+    if not liked:
+        return entry
+    data = json.loads(entry.body)
+    for item in data if isinstance(data, list) else [data]:
+        item["is_liked"] = item["id"] in liked
+    body = dumps(data)
+    return replace(entry, body=body, etag=entity_tag(body), variants={})
+
+
+def personalizer(db, kind: str, viewer):
+    """`personalize` hook for response_cache.serve, or None for anonymous viewers."""
+    if viewer is None:
+        return None
+
+    async def personalize(entry: CacheEntry) -> CacheEntry:
+        return mark_liked(entry, await liked_ids(db, kind, viewer.id, entry.refs))
+
+    return personalize
@@ -1,18 +1,34 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth, blog, projects, interactions
-from database import engine, Base
+from fastapi.responses import JSONResponse, PlainTextResponse
+from routers import auth, blog, projects, interactions, tags, search as search_router
+from database import engine, read_engine, Base, pool_stats
+from auth import get_operator, password_hash_stats
+from cache import response_cache
+from claps import clap_buffer
+from compression import CompressionMiddleware
+from events import event_hub
+from ratelimit import rate_limiter
+from rankings import rankings
+from uploads import UPLOAD_DIR, UploadLimitMiddleware, UploadStaticFiles
+import images
+import lifecycle
+import metrics
+import migrate
 import models
 import os
 
 app = FastAPI(title="Portfolio API")
 
+# serve.py applies migrations once before starting workers and sets this to
+# false; workers then only check that the schema is current
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "true").lower() == "true"
+
 # Create uploads directory if it doesn't exist
-os.makedirs("uploads", exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", UploadStaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 origins = [
     "http://localhost:5173",
@@ -23,27 +39,121 @@ origins = [
     "https://backend.khamkaradinath.online"
 ]
 
+# Inside CORS, so the browser can read a 413
+app.add_middleware(UploadLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# Create tables
+# Cached responses arrive already compressed; this covers the rest
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so timings include CORS handling and compression
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+if read_engine is not None:
+    metrics.instrument_engine(read_engine)
+
+# Bring the schema up to date, then warm up before the server starts accepting connections
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(models.Base.metadata.create_all)
+    if RUN_MIGRATIONS:
+        await migrate.run_migrations(engine)
+    else:
+        missing = await migrate.pending(engine)
+        if missing:
+            raise RuntimeError(f"Database schema is out of date ({', '.join(missing)} pending); run python migrate.py")
+    clap_buffer.start()
+    rankings.start()
+    await event_hub.start()
+    await lifecycle.warm_pool(engine)
+    await lifecycle.warm_cache(app)
+    lifecycle.install_drain_handler(event_hub.close_streams)
+    lifecycle.state.ready = True
+
+@app.on_event("shutdown")
+async def shutdown():
+    lifecycle.state.ready = False
+    # Write out buffered claps before the process exits
+    await clap_buffer.stop()
+    await rankings.stop()
+    await event_hub.stop()
+    images.shutdown()
+    await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
 
 # Include Routers
 app.include_router(auth.router)
 app.include_router(blog.router)
 app.include_router(projects.router)
 app.include_router(interactions.router)
+app.include_router(search_router.router)
+app.include_router(tags.router)
 # hellow
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Portfolio API"}
+
+@app.get("/health/live")
+def liveness():
+    # Answering at all means the event loop is running
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    if lifecycle.state.draining:
+        return JSONResponse({"status": "draining"}, status_code=503)
+    if not lifecycle.state.ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    if not await lifecycle.database_ok(engine):
+        return JSONResponse({"status": "database unavailable"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/cache/stats", dependencies=[Depends(get_operator)])
+def cache_stats():
+    return response_cache.stats()
+
+@app.get("/db/stats", dependencies=[Depends(get_operator)])
+def db_stats():
+    return pool_stats()
+
+def _runtime_samples():
+    cache = response_cache.stats()
+    for name in ("hits", "misses", "evictions"):
+        yield f"response_cache_{name}_total", "counter", f"Response cache {name}.", {}, cache[name]
+    if "bytes" in cache:
+        yield "response_cache_bytes", "gauge", "Bytes held by the in-process response cache.", {}, cache["bytes"]
+    pools = pool_stats()
+    for field, kind, help in (
+        ("checked_out", "gauge", "Connections in use."),
+        ("saturation", "gauge", "Connections in use over pool capacity."),
+        ("wait_seconds_total", "counter", "Time spent waiting for a connection."),
+        ("checkouts", "counter", "Connection checkouts."),
+    ):
+        for pool, stats in pools.items():
+            yield f"db_pool_{field}", kind, help, {"pool": pool}, stats[field]
+    hashing = password_hash_stats()
+    yield "password_hash_queue_depth", "gauge", "bcrypt calls waiting for a worker.", {}, hashing["queue_depth"]
+    yield "password_hash_rejected_total", "counter", "bcrypt calls refused with 503.", {}, hashing["rejected"]
+    yield "clap_buffer_pending", "gauge", "Claps buffered and not yet written.", {}, clap_buffer.pending_total
+    yield "rankings_pending", "gauge", "Posts and projects with ranking updates not yet written.", {}, rankings.stats()["pending"]
+    events = event_hub.stats()
+    yield "events_subscribers", "gauge", "Open event streams.", {}, events["subscribers"]
+    yield "events_published_total", "counter", "Deltas published by write paths.", {}, events["published"]
+    yield "events_delivered_total", "counter", "Deltas handed to event stream subscribers.", {}, events["delivered"]
+    limits = rate_limiter.stats()
+    for name, count in limits["rejected"].items():
+        yield "rate_limit_rejected_total", "counter", "Requests refused with 429.", {"limit": name}, count
+    yield "rate_limit_backend_errors_total", "counter", "Rate limit checks skipped after a backend error.", {}, limits["errors"]
+
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(get_operator)])
+def prometheus_metrics():
+    return PlainTextResponse(metrics.exposition(_runtime_samples()), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,242 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Request instrumentation exported at /metrics in Prometheus text format.
+# MetricsMiddleware times each request and counts bytes sent; cursor hooks on
+# the engines count queries, rows and SQL time into the current request's
+# RequestStats through a context variable. Everything is plain counters in
+# this process, so the per-request cost is a few perf_counter calls and list
+# appends.
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# Statements kept per request for the slow-request log
+TIMELINE_LIMIT = 50
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestStats:
+    __slots__ = (
+        "start", "queries", "rows", "sql_seconds", "serialize_seconds", "bytes_out", "timeline", "done", "streaming"
+    )
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.rows = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.bytes_out = 0
+        # (offset from request start, duration, rows, statement)
+        self.timeline: List[Tuple[float, float, int, str]] = []
+        self.done = False
+        self.streaming = False # Event stream: open for as long as the client stays
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def exposition(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, (counts, total) in self.series.items():
+            labels = _labels(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}'
+            cumulative += counts[-1]
+            yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {cumulative}'
+            yield f"{_series(self.name + '_sum', labels)} {total}"
+            yield f"{_series(self.name + '_count', labels)} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series: Dict[tuple, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def exposition(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self.series.items():
+            yield f"{_series(self.name, _labels(zip(self.labels, label_values)))} {value}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def _series(name: str, labels: str) -> str:
+    return f"{name}{{{labels}}}" if labels else name
+
+
+requests_total = Counter("http_requests_total", "Requests by route and status.", ("method", "route", "status"))
+request_seconds = Histogram(
+    "http_request_duration_seconds", "Time until the last body byte is sent.", LATENCY_BUCKETS, ("method", "route")
+)
+response_bytes = Histogram("http_response_size_bytes", "Response body bytes sent.", BYTES_BUCKETS, ("method", "route"))
+request_queries = Histogram("db_queries_per_request", "SQL statements executed per request.", COUNT_BUCKETS, ("method", "route"))
+request_rows = Histogram("db_rows_per_request", "Rows returned by SELECTs per request.", COUNT_BUCKETS, ("method", "route"))
+request_sql_seconds = Histogram("db_time_per_request_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS, ("method", "route"))
+serialize_seconds = Histogram(
+    "response_serialization_seconds", "Time spent serializing cached response bodies.", LATENCY_BUCKETS, ("method", "route")
+)
+query_seconds = Histogram("db_query_duration_seconds", "Duration of each SQL statement.", LATENCY_BUCKETS)
+slow_requests = Counter("http_slow_requests_total", f"Requests slower than SLOW_REQUEST_MS ({SLOW_REQUEST_MS:g}ms).", ("route",))
+
+_METRICS = [
+    requests_total, request_seconds, response_bytes, request_queries, request_rows,
+    request_sql_seconds, serialize_seconds, query_seconds, slow_requests,
+]
+
+
+def record_serialization(seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.serialize_seconds += seconds
+
+
+# --- SQLAlchemy hooks ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    now = time.perf_counter()
+    duration = now - conn.info.pop("query_start", now)
+    query_seconds.observe(duration)
+    stats = _current.get()
+    if stats is None or stats.done:
+        return
+    # The async drivers' cursors buffer the whole result at execute time
+    rows = len(getattr(cursor, "_rows", ())) if cursor.description is not None else 0
+    stats.queries += 1
+    stats.rows += rows
+    stats.sql_seconds += duration
+    if len(stats.timeline) < TIMELINE_LIMIT:
+        stats.timeline.append((now - duration - stats.start, duration, rows, statement))
+
+
+def instrument_engine(engine):
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- ASGI middleware ---
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        finished_at = None
+
+        async def send_wrapper(message):
+            nonlocal status, finished_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-type" and value.startswith(b"text/event-stream"):
+                        stats.streaming = True
+            elif message["type"] == "http.response.body":
+                stats.bytes_out += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Background tasks run after this and are not part of the request
+                    finished_at = time.perf_counter()
+                    stats.done = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            duration = (finished_at or time.perf_counter()) - stats.start
+            self._record(scope, status, duration, stats)
+
+    def _record(self, scope, status: int, duration: float, stats: RequestStats):
+        route = scope.get("route")
+        # Route templates, not raw paths, keep label cardinality bounded
+        path = getattr(route, "path", None) or "unmatched"
+        method = scope["method"]
+        requests_total.inc(method, path, str(status))
+        if stats.streaming:
+            # Duration is how long the client listened, not latency
+            return
+        request_seconds.observe(duration, method, path)
+        response_bytes.observe(stats.bytes_out, method, path)
+        request_queries.observe(stats.queries, method, path)
+        request_rows.observe(stats.rows, method, path)
+        request_sql_seconds.observe(stats.sql_seconds, method, path)
+        if stats.serialize_seconds:
+            serialize_seconds.observe(stats.serialize_seconds, method, path)
+
+        if duration * 1000 >= SLOW_REQUEST_MS:
+            slow_requests.inc(path)
+            lines = [
+                f"+{offset * 1000:7.1f}ms {elapsed * 1000:7.1f}ms rows={rows:<5} {' '.join(statement.split())[:300]}"
+                for offset, elapsed, rows, statement in stats.timeline
+            ]
+            logger.warning(
+                "Slow request %s %s -> %s in %.1fms: %d queries (%.1fms SQL), %d rows, %d bytes\n%s",
+                method, scope.get("path"), status, duration * 1000, stats.queries,
+                stats.sql_seconds * 1000, stats.rows, stats.bytes_out, "\n".join(lines),
+            )
+
+
+def exposition(samples: Iterable[Tuple[str, str, str, dict, float]] = ()) -> str:
+    """Prometheus text format for the request metrics plus extra (name, type, help, labels, value) samples."""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.exposition())
+    described = set()
+    for name, kind, help, labels, value in samples:
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{_series(name, _labels(labels.items()))} {value}")
+    return "\n".join(lines) + "\n"
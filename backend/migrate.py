@@ -0,0 +1,131 @@
+"""Schema migrations and query-plan checks.
+
+    python migrate.py                 apply pending migrations
+    python migrate.py --check-plans   fail if a hot query does not use an index
+"""
+import asyncio
+import importlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Arbitrary constant; serializes migration runs across workers and hosts
+ADVISORY_LOCK_ID = 74201913
+
+
+def discover():
+    versions = sorted(
+        name[:-3] for name in os.listdir(MIGRATIONS_DIR)
+        if name.endswith(".py") and name[0].isdigit()
+    )
+    return [(version, importlib.import_module(f"migrations.{version}")) for version in versions]
+
+
+async def run_migrations(engine):
+    """Apply pending migrations, each in its own transaction. Returns the versions applied."""
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (version VARCHAR PRIMARY KEY, applied_at TIMESTAMP)"
+        ))
+
+    applied = []
+    for version, module in discover():
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+            done = await conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :version"), {"version": version}
+            )
+            if done.first():
+                continue
+            await module.upgrade(conn)
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": version, "applied_at": datetime.utcnow()},
+            )
+            applied.append(version)
+    return applied
+
+
+async def pending(engine):
+    """Versions not yet applied; read-only, for workers that must not migrate themselves."""
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version FROM schema_migrations"))
+        except DBAPIError:
+            # No bookkeeping table yet: nothing has been applied
+            return [version for version, _ in discover()]
+        applied = {row[0] for row in result}
+    return [version for version, _ in discover() if version not in applied]
+
+
+# Hot access paths and the tables whose scans must use an index
+PLAN_CHECKS = [
+    ("blog list page", "SELECT id FROM blog_posts ORDER BY created_at DESC, id DESC LIMIT 20", "blog_posts"),
+    ("project list page", "SELECT id FROM projects ORDER BY created_at DESC, id DESC LIMIT 20", "projects"),
+    ("trending posts", "SELECT ref_id FROM rankings WHERE kind = 'blog' ORDER BY trending DESC, ref_id DESC LIMIT 20", "rankings"),
+    ("popular projects", "SELECT ref_id FROM rankings WHERE kind = 'project' ORDER BY popular DESC, ref_id DESC LIMIT 20", "rankings"),
+    ("blog comments", "SELECT id FROM blog_comments WHERE blog_id = 1 ORDER BY created_at", "blog_comments"),
+    ("project comments", "SELECT id FROM project_comments WHERE project_id = 1 ORDER BY created_at", "project_comments"),
+    ("comment replies", "SELECT id FROM blog_comments WHERE parent_id = 1 ORDER BY created_at", "blog_comments"),
+    ("likes of a post", "SELECT user_id FROM blog_likes WHERE blog_id = 1", "blog_likes"),
+    ("likes of a project", "SELECT user_id FROM project_likes WHERE project_id = 1", "project_likes"),
+    ("likes by a user", "SELECT blog_id FROM blog_likes WHERE user_id = 1", "blog_likes"),
+    ("posts with a tag", "SELECT blog_id FROM blog_tags WHERE tag_id = 1", "blog_tags"),
+    ("posts by owner", "SELECT id FROM blog_posts WHERE owner_id = 1", "blog_posts"),
+]
+
+
+def _postgres_seq_scans(plan, table):
+    node = plan.get("Plan", plan)
+    found = node.get("Node Type") == "Seq Scan" and node.get("Relation Name") == table
+    return found or any(_postgres_seq_scans(child, table) for child in node.get("Plans", []))
+
+
+async def check_plans(engine):
+    """Return a list of failures: hot queries that scan a table without an index."""
+    failures = []
+    async with engine.connect() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            # Small tables make the planner prefer a seq scan; forbid it so only a missing index shows one
+            await conn.execute(text("SET enable_seqscan = off"))
+        for name, sql, table in PLAN_CHECKS:
+            if postgres:
+                result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+                plan = result.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                if _postgres_seq_scans(plan[0], table):
+                    failures.append(f"{name}: sequential scan on {table}")
+            else:
+                result = await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+                details = [row[-1] for row in result]
+                if any(d.startswith(f"SCAN {table}") and "INDEX" not in d for d in details):
+                    failures.append(f"{name}: {'; '.join(details)}")
+                elif any("USE TEMP B-TREE FOR ORDER BY" in d for d in details):
+                    failures.append(f"{name}: sort not served by an index")
+    return failures
+
+
+async def main(argv):
+    from database import engine
+    applied = await run_migrations(engine)
+    print(f"Applied {len(applied)} migration(s): {', '.join(applied) or 'none'}")
+    if "--check-plans" in argv:
+        failures = await check_plans(engine)
+        for failure in failures:
+            print(f"FAIL {failure}")
+        if failures:
+            return 1
+        print(f"All {len(PLAN_CHECKS)} query plans use indexes")
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,88 @@
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text
+
+# The tables as they were before versioned migrations, frozen here so this
+# version creates the same schema whatever the models look like later.
+# Every change since is a later migration; a fresh database runs them all.
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String, unique=True, index=True),
+    Column("email", String, unique=True, index=True),
+    Column("hashed_password", String),
+    Column("is_admin", Boolean),
+)
+
+Table(
+    "tags", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, unique=True, index=True),
+)
+
+Table(
+    "blog_posts", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String, index=True),
+    Column("subtitle", String),
+    Column("content", Text),
+    Column("image_url", String),
+    Column("created_at", DateTime),
+    Column("claps", Integer),
+    Column("reading_time", Integer),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+)
+
+Table(
+    "projects", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String, index=True),
+    Column("description", Text),
+    Column("image_url", String),
+    Column("project_url", String),
+    Column("github_url", String),
+    Column("created_at", DateTime),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+)
+
+Table(
+    "blog_tags", metadata,
+    Column("blog_id", Integer, ForeignKey("blog_posts.id")),
+    Column("tag_id", Integer, ForeignKey("tags.id")),
+)
+
+Table(
+    "blog_comments", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("content", Text),
+    Column("created_at", DateTime),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("blog_id", Integer, ForeignKey("blog_posts.id")),
+)
+
+Table(
+    "project_comments", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("content", Text),
+    Column("created_at", DateTime),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("project_id", Integer, ForeignKey("projects.id")),
+)
+
+Table(
+    "blog_likes", metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("blog_id", Integer, ForeignKey("blog_posts.id"), primary_key=True),
+)
+
+Table(
+    "project_likes", metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("project_id", Integer, ForeignKey("projects.id"), primary_key=True),
+)
+
+
+async def upgrade(conn):
+    # Creates only tables that do not exist yet; existing tables are left alone
+    await conn.run_sync(metadata.create_all)
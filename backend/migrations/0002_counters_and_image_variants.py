@@ -0,0 +1,24 @@
+from sqlalchemy import text
+
+from migrations import add_column
+
+
+async def upgrade(conn):
+    # Columns that were added to the models before versioned migrations existed
+    json_type = "JSONB" if conn.dialect.name == "postgresql" else "JSON"
+    for table in ("blog_posts", "projects"):
+        await add_column(conn, table, "likes_count", "INTEGER DEFAULT 0")
+        await add_column(conn, table, "comments_count", "INTEGER DEFAULT 0")
+        await add_column(conn, table, "image_variants", json_type)
+
+    # Counters start from the rows they count
+    await conn.execute(text("""
+        UPDATE blog_posts SET
+            likes_count = (SELECT count(*) FROM blog_likes WHERE blog_likes.blog_id = blog_posts.id),
+            comments_count = (SELECT count(*) FROM blog_comments WHERE blog_comments.blog_id = blog_posts.id)
+    """))
+    await conn.execute(text("""
+        UPDATE projects SET
+            likes_count = (SELECT count(*) FROM project_likes WHERE project_likes.project_id = projects.id),
+            comments_count = (SELECT count(*) FROM project_comments WHERE project_comments.project_id = projects.id)
+    """))
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, UniqueConstraint
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import search
+
+metadata = MetaData()
+
+search_documents = Table(
+    "search_documents", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("kind", String, nullable=False),
+    Column("ref_id", Integer, nullable=False),
+    Column("title", String),
+    Column("body", Text),
+    Column("created_at", DateTime),
+    UniqueConstraint("kind", "ref_id", name="uq_search_documents_kind_ref"),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(search_documents.create, checkfirst=True)
+    await search.ensure_search_index(conn)
+    # Joins the migration's transaction; the runner commits it
+    db = AsyncSession(bind=conn)
+    await search.reindex_all(db)
+    await db.flush()
+    await db.close()
@@ -0,0 +1,32 @@
+from sqlalchemy import text
+
+from migrations import primary_key
+
+
+async def upgrade(conn):
+    if await primary_key(conn, "blog_tags"):
+        return
+
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text("DELETE FROM blog_tags WHERE blog_id IS NULL OR tag_id IS NULL"))
+        await conn.execute(text("""
+            DELETE FROM blog_tags a USING blog_tags b
+            WHERE a.ctid < b.ctid AND a.blog_id = b.blog_id AND a.tag_id = b.tag_id
+        """))
+        await conn.execute(text("ALTER TABLE blog_tags ADD PRIMARY KEY (blog_id, tag_id)"))
+        return
+
+    # SQLite cannot add a primary key in place; rebuild the table
+    await conn.execute(text("""
+        CREATE TABLE blog_tags_new (
+            blog_id INTEGER NOT NULL REFERENCES blog_posts (id),
+            tag_id INTEGER NOT NULL REFERENCES tags (id),
+            PRIMARY KEY (blog_id, tag_id)
+        )
+    """))
+    await conn.execute(text("""
+        INSERT OR IGNORE INTO blog_tags_new (blog_id, tag_id)
+        SELECT blog_id, tag_id FROM blog_tags WHERE blog_id IS NOT NULL AND tag_id IS NOT NULL
+    """))
+    await conn.execute(text("DROP TABLE blog_tags"))
+    await conn.execute(text("ALTER TABLE blog_tags_new RENAME TO blog_tags"))
@@ -0,0 +1,19 @@
+import models
+from migrations import create_indexes
+
+
+async def upgrade(conn):
+    # Keyset pagination; a backward scan serves ORDER BY created_at DESC, id DESC
+    await create_indexes(conn, models.BlogPost.__table__, "ix_blog_posts_created_at_id", "ix_blog_posts_owner_id")
+    await create_indexes(conn, models.Project.__table__, "ix_projects_created_at_id", "ix_projects_owner_id")
+    # Comment threads per post, oldest first
+    await create_indexes(
+        conn, models.BlogComment.__table__, "ix_blog_comments_blog_id_created_at", "ix_blog_comments_user_id"
+    )
+    await create_indexes(
+        conn, models.ProjectComment.__table__, "ix_project_comments_project_id_created_at", "ix_project_comments_user_id"
+    )
+    # Like primary keys lead with user_id; these cover the post -> likes direction
+    await create_indexes(conn, models.BlogLike.__table__, "ix_blog_likes_blog_id_user_id")
+    await create_indexes(conn, models.ProjectLike.__table__, "ix_project_likes_project_id_user_id")
+    await create_indexes(conn, models.blog_tags, "ix_blog_tags_tag_id_blog_id")
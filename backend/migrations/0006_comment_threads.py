@@ -0,0 +1,10 @@
+import models
+from migrations import add_column, create_indexes
+
+
+async def upgrade(conn):
+    # Replies point at their parent comment; existing comments stay top-level
+    await add_column(conn, "blog_comments", "parent_id", "INTEGER REFERENCES blog_comments(id) ON DELETE CASCADE")
+    await add_column(conn, "project_comments", "parent_id", "INTEGER REFERENCES project_comments(id) ON DELETE CASCADE")
+    await create_indexes(conn, models.BlogComment.__table__, "ix_blog_comments_parent_id_created_at")
+    await create_indexes(conn, models.ProjectComment.__table__, "ix_project_comments_parent_id_created_at")
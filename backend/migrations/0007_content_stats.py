@@ -0,0 +1,10 @@
+from migrations import add_column
+
+
+async def upgrade(conn):
+    # Existing posts are filled in by `python backfill.py stats`
+    json_type = "JSONB" if conn.dialect.name == "postgresql" else "JSON"
+    await add_column(conn, "blog_posts", "word_count", "INTEGER DEFAULT 0")
+    await add_column(conn, "blog_posts", "excerpt", "TEXT")
+    await add_column(conn, "blog_posts", "outline", json_type)
+    await add_column(conn, "blog_posts", "content_hash", "VARCHAR(64)")
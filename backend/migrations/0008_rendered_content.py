@@ -0,0 +1,8 @@
+from migrations import add_column
+
+
+async def upgrade(conn):
+    # Existing posts are rendered by `python backfill.py render`
+    await add_column(conn, "blog_posts", "content_html", "TEXT")
+    await add_column(conn, "blog_posts", "toc_html", "TEXT")
+    await add_column(conn, "blog_posts", "render_version", "VARCHAR(16)")
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table
+
+from migrations import add_column
+
+metadata = MetaData()
+
+rankings = Table(
+    "rankings", metadata,
+    Column("kind", String, primary_key=True),
+    Column("ref_id", Integer, primary_key=True),
+    Column("trending", Float, nullable=False),
+    Column("popular", Float, nullable=False),
+    Column("clap_trending", Float, nullable=True),
+    Column("updated_at", DateTime),
+    Index("ix_rankings_kind_trending_ref_id", "kind", "trending", "ref_id"),
+    Index("ix_rankings_kind_popular_ref_id", "kind", "popular", "ref_id"),
+)
+
+
+async def upgrade(conn):
+    # Likes made before this have no time; rankings date them at their post's creation
+    await add_column(conn, "blog_likes", "created_at", "TIMESTAMP")
+    await add_column(conn, "project_likes", "created_at", "TIMESTAMP")
+    # Filled in by the first rankings rebuild after startup
+    await conn.run_sync(rankings.create, checkfirst=True)
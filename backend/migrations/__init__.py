@@ -0,0 +1,45 @@
+"""Versioned schema migrations, applied in filename order by migrate.py.
+
+Each module defines `async def upgrade(conn)` taking an AsyncConnection inside
+a transaction. Version 0001 creates the tables as they were before
+versioning, from a snapshot frozen in that module, and later versions add
+everything since; migrations never create tables from the live models, which
+keep changing. A database created before versioning may already have some
+of those changes (it was built with create_all), so every migration must
+inspect before it alters.
+"""
+from sqlalchemy import inspect, text
+
+
+async def _inspect(conn, fn):
+    return await conn.run_sync(lambda sync_conn: fn(inspect(sync_conn)))
+
+
+async def has_column(conn, table: str, column: str) -> bool:
+    columns = await _inspect(conn, lambda insp: insp.get_columns(table))
+    return any(c["name"] == column for c in columns)
+
+
+async def index_names(conn, table: str) -> set:
+    indexes = await _inspect(conn, lambda insp: insp.get_indexes(table))
+    return {index["name"] for index in indexes}
+
+
+async def primary_key(conn, table: str) -> list:
+    pk = await _inspect(conn, lambda insp: insp.get_pk_constraint(table))
+    return pk.get("constrained_columns") or []
+
+
+async def add_column(conn, table: str, column: str, ddl: str):
+    """ALTER TABLE ... ADD COLUMN unless the column exists."""
+    if not await has_column(conn, table, column):
+        await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+async def create_indexes(conn, table, *names: str):
+    """Create the named indexes declared on a model table, unless present."""
+    existing = await index_names(conn, table.name)
+    declared = {index.name: index for index in table.indexes}
+    for name in names:
+        if name not in existing:
+            await conn.run_sync(declared[name].create)
@@ -1,12 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Table, Boolean
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Table, Boolean, Index, JSON, UniqueConstraint, Float
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
 
 # Association table for Many-to-Many relationship between BlogPost and Tag
 blog_tags = Table('blog_tags', Base.metadata,
-    Column('blog_id', Integer, ForeignKey('blog_posts.id')),
-    Column('tag_id', Integer, ForeignKey('tags.id'))
+    Column('blog_id', Integer, ForeignKey('blog_posts.id'), primary_key=True),
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    # Reverse direction of the primary key, for tag -> posts lookups
+    Index('ix_blog_tags_tag_id_blog_id', 'tag_id', 'blog_id')
 )
 
 class User(Base):
@@ -32,16 +34,34 @@ class BlogPost(Base):
     subtitle = Column(String, nullable=True)
     content = Column(Text)
     image_url = Column(String, nullable=True)
+    image_variants = Column(JSON, nullable=True) # Filled in by images.process_image
     created_at = Column(DateTime, default=datetime.utcnow)
     claps = Column(Integer, default=0)
     reading_time = Column(Integer, default=0) # In minutes
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    # Filled in from content by analysis.analyze
+    word_count = Column(Integer, default=0, server_default="0")
+    excerpt = Column(Text, nullable=True)
+    outline = Column(JSON, nullable=True) # [{level, text, anchor}] for each heading
+    content_hash = Column(String(64), nullable=True) # SHA-256 of content
+    # Filled in from content by rendering.render
+    content_html = Column(Text, nullable=True)
+    toc_html = Column(Text, nullable=True)
+    render_version = Column(String(16), nullable=True) # rendering.RENDER_VERSION used for content_html
+    likes_count = Column(Integer, default=0, server_default="0")
+    comments_count = Column(Integer, default=0, server_default="0")
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
 
     owner = relationship("User")
     tags = relationship("Tag", secondary=blog_tags, backref="blogs")
     comments = relationship("BlogComment", back_populates="blog", cascade="all, delete-orphan")
     likes = relationship("BlogLike", back_populates="blog", cascade="all, delete-orphan")
 
+    # Not mapped: newest top-level comments, filled in by comments.attach_latest
+    latest_comments = ()
+
+    # Backs keyset pagination ordered by (created_at DESC, id DESC)
+    __table_args__ = (Index("ix_blog_posts_created_at_id", "created_at", "id"),)
+
 class Project(Base):
     __tablename__ = "projects"
 
@@ -49,26 +69,40 @@ class Project(Base):
     title = Column(String, index=True)
     description = Column(Text)
     image_url = Column(String, nullable=True)
+    image_variants = Column(JSON, nullable=True)
     project_url = Column(String, nullable=True)
     github_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    likes_count = Column(Integer, default=0, server_default="0")
+    comments_count = Column(Integer, default=0, server_default="0")
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
 
     owner = relationship("User")
     comments = relationship("ProjectComment", back_populates="project", cascade="all, delete-orphan")
     likes = relationship("ProjectLike", back_populates="project", cascade="all, delete-orphan")
 
+    latest_comments = ()
+
+    __table_args__ = (Index("ix_projects_created_at_id", "created_at", "id"),)
+
 class BlogComment(Base):
     __tablename__ = "blog_comments"
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     blog_id = Column(Integer, ForeignKey("blog_posts.id"))
+    parent_id = Column(Integer, ForeignKey("blog_comments.id", ondelete="CASCADE"), nullable=True) # Set on replies
 
     user = relationship("User")
     blog = relationship("BlogPost", back_populates="comments")
+    parent = relationship("BlogComment", remote_side=[id])
+
+    __table_args__ = (
+        Index("ix_blog_comments_blog_id_created_at", "blog_id", "created_at"),
+        Index("ix_blog_comments_parent_id_created_at", "parent_id", "created_at"),
+    )
 
 class ProjectComment(Base):
     __tablename__ = "project_comments"
@@ -76,26 +110,70 @@ class ProjectComment(Base):
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
+    parent_id = Column(Integer, ForeignKey("project_comments.id", ondelete="CASCADE"), nullable=True)
 
     user = relationship("User")
     project = relationship("Project", back_populates="comments")
+    parent = relationship("ProjectComment", remote_side=[id])
+
+    __table_args__ = (
+        Index("ix_project_comments_project_id_created_at", "project_id", "created_at"),
+        Index("ix_project_comments_parent_id_created_at", "parent_id", "created_at"),
+    )
 
 class BlogLike(Base):
     __tablename__ = "blog_likes"
 
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
     blog_id = Column(Integer, ForeignKey("blog_posts.id"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True) # NULL for likes made before it was recorded
 
     user = relationship("User")
     blog = relationship("BlogPost", back_populates="likes")
 
+    # The primary key leads with user_id; this covers per-post lookups and cascades
+    __table_args__ = (Index("ix_blog_likes_blog_id_user_id", "blog_id", "user_id"),)
+
 class ProjectLike(Base):
     __tablename__ = "project_likes"
 
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
     project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
 
     user = relationship("User")
     project = relationship("Project", back_populates="likes")
+
+    __table_args__ = (Index("ix_project_likes_project_id_user_id", "project_id", "user_id"),)
+
+class SearchDocument(Base):
+    """One row per searchable blog post or project; see search.py."""
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False) # "blog" or "project"
+    ref_id = Column(Integer, nullable=False)
+    title = Column(String)
+    body = Column(Text)
+    created_at = Column(DateTime)
+
+    __table_args__ = (UniqueConstraint("kind", "ref_id", name="uq_search_documents_kind_ref"),)
+
+class Ranking(Base):
+    """Precomputed list orderings for one blog post or project; see rankings.py."""
+    __tablename__ = "rankings"
+
+    kind = Column(String, primary_key=True) # "blog" or "project"
+    ref_id = Column(Integer, primary_key=True)
+    trending = Column(Float, nullable=False) # log2 of the forward-decayed interaction score
+    popular = Column(Float, nullable=False, default=0) # All-time weighted interactions
+    clap_trending = Column(Float, nullable=True) # Claps' share of trending, kept across rebuilds
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    # Back keyset pagination ordered by (score DESC, ref_id DESC)
+    __table_args__ = (
+        Index("ix_rankings_kind_trending_ref_id", "kind", "trending", "ref_id"),
+        Index("ix_rankings_kind_popular_ref_id", "kind", "popular", "ref_id"),
+    )
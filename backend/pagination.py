@@ -0,0 +1,53 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Cursors are opaque to clients: urlsafe base64 of a JSON list holding the sort
+# key of the last row on the previous page. List endpoints order by
+# created_at DESC, id DESC and use (created_at, id); comment threads read
+# oldest first with the same key. Ranked list orders use (score, id), see
+# rankings.sorted_page.
+
+def encode_token(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_token(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return encode_token([created_at.isoformat(), row_id])
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = decode_token(cursor)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(created_col, id_col, cursor: Optional[str], descending: bool = True):
+    """WHERE clause selecting rows strictly after the cursor, or None for page one."""
+    if not cursor:
+        return None
+    created_at, row_id = decode_cursor(cursor)
+    if descending:
+        return or_(created_col < created_at, and_(created_col == created_at, id_col < row_id))
+    return or_(created_col > created_at, and_(created_col == created_at, id_col > row_id))
+
+def next_cursor(rows, limit: int) -> Optional[str]:
+    """Cursor for the page after `rows`, given rows were fetched with limit + 1."""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(last.created_at, last.id)
@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import math
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, or_, select
+
+from cache import response_cache
+from database import dialect_insert, engine
+from models import BlogComment, BlogLike, BlogPost, Project, ProjectComment, ProjectLike, Ranking
+from pagination import decode_token, encode_token, keyset_filter, next_cursor
+
+logger = logging.getLogger(__name__)
+
+# "trending" and "popular" orderings for the blog and project lists, kept in
+# the rankings table so a page is one index range scan.
+#
+# popular is the all-time weighted sum of likes, comments and claps.
+# trending decays each interaction by its age with a half-life of
+# RANKING_HALF_LIFE_HOURS. Scores use forward decay: an event at time t adds
+# weight * 2^((t - EPOCH) / half_life), so every score "decays" at the same
+# rate and the order never changes just because time passes. Only new
+# events move a score, and no job has to rewrite all rows to age them.
+# Values are stored as log2 so they stay small however far t is from EPOCH.
+#
+# A new post or project gets its row from add_ranking() in the transaction
+# that creates it, so ranked lists show it straight away. Other write paths
+# call record(); deltas are summed per post in memory and written every
+# RANKING_FLUSH_INTERVAL seconds, like ClapBuffer. Every
+# RANKING_REBUILD_SECONDS the scores are recomputed from the counters, likes
+# and comments, which corrects unlikes and deletions (not applied
+# incrementally to trending) and updates lost between workers. Claps
+# have no per-clap rows, so their share of trending carries over from the
+# incremental updates.
+
+RANKING_HALF_LIFE_HOURS = float(os.getenv("RANKING_HALF_LIFE_HOURS", "48"))
+RANKING_FLUSH_INTERVAL = float(os.getenv("RANKING_FLUSH_INTERVAL", "10"))
+RANKING_REBUILD_SECONDS = float(os.getenv("RANKING_REBUILD_SECONDS", "900"))
+# Arbitrary constant; one worker rebuilds at a time
+REBUILD_LOCK_ID = 74201914
+
+EPOCH = datetime(2024, 1, 1)
+HALF_LIFE_SECONDS = RANKING_HALF_LIFE_HOURS * 3600
+
+WEIGHTS = {"like": 2.0, "comment": 3.0, "clap": 0.2, "created": 1.0}
+
+
+@dataclass(frozen=True)
+class Source:
+    model: type
+    like: type
+    like_fk: object
+    comment: type
+    comment_fk: object
+
+
+SOURCES = {
+    "blog": Source(BlogPost, BlogLike, BlogLike.blog_id, BlogComment, BlogComment.blog_id),
+    "project": Source(Project, ProjectLike, ProjectLike.project_id, ProjectComment, ProjectComment.project_id),
+}
+
+
+def log_add(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    """log2(2**a + 2**b) without leaving the log domain; None stands for a zero score."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def event_score(weight: float, at: datetime) -> float:
+    return math.log2(weight) + (at - EPOCH).total_seconds() / HALF_LIFE_SECONDS
+
+
+def popular_score(kind: str, likes: int, comments: int, claps: int = 0) -> float:
+    # BlogPost.claps also counts likes (see like_blog); only the rest are anonymous claps
+    anonymous = max((claps or 0) - (likes or 0), 0) if kind == "blog" else 0
+    return WEIGHTS["like"] * (likes or 0) + WEIGHTS["comment"] * (comments or 0) + WEIGHTS["clap"] * anonymous
+
+
+class Delta:
+    __slots__ = ("popular", "trending", "claps")
+
+    def __init__(self):
+        self.popular = 0.0
+        self.trending: Optional[float] = None
+        self.claps: Optional[float] = None
+
+    def merge(self, other: "Delta"):
+        self.popular += other.popular
+        self.trending = log_add(self.trending, other.trending)
+        self.claps = log_add(self.claps, other.claps)
+
+
+class RankingAggregator:
+    def __init__(self, flush_interval: float = RANKING_FLUSH_INTERVAL, rebuild_seconds: float = RANKING_REBUILD_SECONDS):
+        self.flush_interval = flush_interval
+        self.rebuild_seconds = rebuild_seconds
+        self.pending: Dict[Tuple[str, int], Delta] = {}
+        self.rebuilt_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, kind: str, ref_id: int, event: str, count: int = 1):
+        """Count an interaction; "unlike" only lowers popular, the next rebuild corrects trending."""
+        delta = self.pending.setdefault((kind, ref_id), Delta())
+        if event == "unlike":
+            delta.popular -= WEIGHTS["like"] * count
+            return
+        if event != "created":
+            delta.popular += WEIGHTS[event] * count
+        score = event_score(WEIGHTS[event] * count, datetime.utcnow())
+        delta.trending = log_add(delta.trending, score)
+        if event == "clap":
+            delta.claps = log_add(delta.claps, score)
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        try:
+            # On the primary: a session would send the locking SELECT to the replica
+            async with engine.begin() as conn:
+                for kind in {kind for kind, _ in batch}:
+                    await self._apply(conn, kind, {ref_id: d for (k, ref_id), d in batch.items() if k == kind})
+        except Exception:
+            logger.exception("Failed to flush ranking updates for %d item(s)", len(batch))
+            for key, delta in batch.items():
+                self.pending.setdefault(key, Delta()).merge(delta)
+            return
+        await response_cache.invalidate(*{f"{kind}:ranking" for kind, _ in batch})
+
+    async def _apply(self, conn, kind: str, deltas: Dict[int, Delta]):
+        result = await conn.execute(
+            select(Ranking).where(Ranking.kind == kind, Ranking.ref_id.in_(deltas)).with_for_update()
+        )
+        current = {row.ref_id: row for row in result}
+        now = datetime.utcnow()
+        rows = []
+        for ref_id, delta in deltas.items():
+            row = current.get(ref_id)
+            if row is None and delta.trending is None:
+                continue  # Only unlikes for an item not ranked yet; the rebuild will add it
+            rows.append({
+                "kind": kind,
+                "ref_id": ref_id,
+                "trending": log_add(row.trending if row else None, delta.trending),
+                "popular": max((row.popular if row else 0.0) + delta.popular, 0.0),
+                "clap_trending": log_add(row.clap_trending if row else None, delta.claps),
+                "updated_at": now,
+            })
+        if rows:
+            await conn.execute(_upsert(), rows)
+
+    async def rebuild(self) -> bool:
+        """Recompute every score from the source tables. False if another worker is already at it."""
+        async with self._lock:
+            # Pending claps must reach clap_trending before it is carried over
+            await self._flush()
+            async with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    locked = await conn.execute(select(func.pg_try_advisory_xact_lock(REBUILD_LOCK_ID)))
+                    if not locked.scalar():
+                        return False
+                for kind, source in SOURCES.items():
+                    await self._rebuild_kind(conn, kind, source)
+            self.rebuilt_at = datetime.utcnow()
+        await response_cache.invalidate(*(f"{kind}:ranking" for kind in SOURCES))
+        return True
+
+    async def _rebuild_kind(self, conn, kind: str, source: Source):
+        model = source.model
+        columns = [model.id, model.created_at, model.likes_count, model.comments_count]
+        if kind == "blog":
+            columns.append(model.claps)
+        created: Dict[int, datetime] = {}
+        trending: Dict[int, Optional[float]] = {}
+        popular: Dict[int, float] = {}
+        now = datetime.utcnow()
+        for row in await conn.execute(select(*columns)):
+            created[row.id] = row.created_at or now
+            trending[row.id] = event_score(WEIGHTS["created"], created[row.id])
+            popular[row.id] = popular_score(kind, row.likes_count, row.comments_count, row.claps if kind == "blog" else 0)
+
+        for event, table, fk in (("like", source.like, source.like_fk), ("comment", source.comment, source.comment_fk)):
+            rows = await conn.stream(select(fk, table.created_at).execution_options(yield_per=5000))
+            async for ref_id, at in rows:
+                if ref_id in trending:
+                    trending[ref_id] = log_add(trending[ref_id], event_score(WEIGHTS[event], at or created[ref_id]))
+
+        claps = await conn.execute(
+            select(Ranking.ref_id, Ranking.clap_trending).where(Ranking.kind == kind, Ranking.clap_trending.is_not(None))
+        )
+        clap_trending = dict(claps.all())
+        await conn.execute(delete(Ranking).where(Ranking.kind == kind, Ranking.ref_id.not_in(select(model.id))))
+        rows = [
+            {
+                "kind": kind,
+                "ref_id": ref_id,
+                "trending": log_add(score, clap_trending.get(ref_id)),
+                "popular": popular[ref_id],
+                "clap_trending": clap_trending.get(ref_id),
+                "updated_at": now,
+            }
+            for ref_id, score in trending.items()
+        ]
+        for start in range(0, len(rows), 1000):
+            await conn.execute(_upsert(), rows[start:start + 1000])
+
+    async def _run(self):
+        next_rebuild = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if loop.time() >= next_rebuild:
+                    await self.rebuild()
+                    next_rebuild = loop.time() + self.rebuild_seconds
+                else:
+                    await self.flush()
+            except Exception:
+                logger.exception("Ranking rebuild failed")
+                next_rebuild = loop.time() + self.rebuild_seconds
+            await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "rebuilt_at": self.rebuilt_at.isoformat() if self.rebuilt_at else None,
+        }
+
+
+async def add_ranking(db, kind: str, ref_id: int, created_at: Optional[datetime]):
+    """Initial ranking row for a new item: its creation event and no interactions yet."""
+    row = {
+        "kind": kind,
+        "ref_id": ref_id,
+        "trending": event_score(WEIGHTS["created"], created_at or datetime.utcnow()),
+        "popular": 0.0,
+        "clap_trending": None,
+        "updated_at": datetime.utcnow(),
+    }
+    await db.execute(_upsert(), [row])
+
+
+def _upsert():
+    stmt = dialect_insert(Ranking)
+    return stmt.on_conflict_do_update(
+        index_elements=[Ranking.kind, Ranking.ref_id],
+        set_={
+            "trending": stmt.excluded.trending,
+            "popular": stmt.excluded.popular,
+            "clap_trending": stmt.excluded.clap_trending,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+def decode_score_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, ref_id = decode_token(cursor)
+        return float(score), int(ref_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def sorted_page(db, query, model, kind: str, sort: str, cursor: Optional[str], limit: int):
+    """One page of `query` (a select of `model`) in `sort` order; returns (rows, cursor for the next page).
+
+    Ranked pages are keyed by (score, id); scores move between requests, so
+    an item can show up on two pages or be skipped while a client pages.
+    """
+    if sort == "recent":
+        after = keyset_filter(model.created_at, model.id, cursor)
+        if after is not None:
+            query = query.where(after)
+        result = await db.execute(query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1))
+        rows = result.scalars().all()
+        return rows[:limit], next_cursor(rows, limit)
+
+    score = getattr(Ranking, sort)
+    query = query.add_columns(score).join(Ranking, and_(Ranking.kind == kind, Ranking.ref_id == model.id))
+    if cursor:
+        value, ref_id = decode_score_cursor(cursor)
+        query = query.where(or_(score < value, and_(score == value, Ranking.ref_id < ref_id)))
+    result = await db.execute(query.order_by(score.desc(), Ranking.ref_id.desc()).limit(limit + 1))
+    rows = result.all()
+    cursor_out = None
+    if len(rows) > limit:
+        last, value = rows[limit - 1]
+        cursor_out = encode_token([value, last.id])
+    return [row[0] for row in rows[:limit]], cursor_out
+
+
+rankings = RankingAggregator()
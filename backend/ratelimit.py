@@ -0,0 +1,184 @@
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.security.utils import get_authorization_scheme_param
+
+from auth import token_username
+
+# Token-bucket rate limits for the interaction and auth endpoints. Each route
+# names a limit; a bucket holds up to `burst` requests and refills at
+# burst / period per second, keyed by client IP or, on routes that require a
+# login, by the verified username (falling back to the IP for anonymous or
+# invalid tokens). The check runs as a route dependency declared in the
+# decorator, which FastAPI resolves before the handler's own parameters, so a
+# refused request never opens a database session or reaches bcrypt.
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", os.getenv("CACHE_URL", "redis://localhost:6379/0"))
+# Buckets kept by the memory backend; the least recently used are dropped,
+# which only forgets a client's history (its bucket starts full again)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+@dataclass(frozen=True)
+class Limit:
+    burst: int
+    period: float  # Seconds to refill a full bucket
+    per_user: bool = False
+
+    @property
+    def rate(self) -> float:
+        return self.burst / self.period
+
+    @classmethod
+    def parse(cls, spec: str, per_user: bool = False) -> "Limit":
+        """"30/60" allows bursts of 30 requests and 30 requests a minute sustained."""
+        burst, _, period = spec.partition("/")
+        return cls(int(burst), float(period), per_user)
+
+
+LIMITS: Dict[str, Limit] = {
+    "clap": Limit.parse(os.getenv("RATE_LIMIT_CLAP", "60/60")),
+    "login": Limit.parse(os.getenv("RATE_LIMIT_LOGIN", "10/60")),
+    "register": Limit.parse(os.getenv("RATE_LIMIT_REGISTER", "5/3600")),
+    "like": Limit.parse(os.getenv("RATE_LIMIT_LIKE", "30/60"), per_user=True),
+    "comment": Limit.parse(os.getenv("RATE_LIMIT_COMMENT", "10/60"), per_user=True),
+}
+
+
+def refill(tokens: float, updated: float, now: float, limit: Limit) -> Tuple[bool, float, float]:
+    """Take one token; returns (allowed, tokens left, seconds until one is available)."""
+    tokens = min(limit.burst, tokens + max(0.0, now - updated) * limit.rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / limit.rate
+
+
+class MemoryBackend:
+    """Per-process buckets; with several workers each one allows the full limit."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        now = self.clock()
+        tokens, updated = self.buckets.pop(key, (limit.burst, now))
+        allowed, tokens, retry_after = refill(tokens, updated, now, limit)
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class SharedBackend:
+    """Buckets in a Redis-compatible server, shared by every worker.
+
+    The refill runs atomically in a Lua script through the client's `eval`;
+    a local stand-in for tests only needs an `eval` coroutine that applies
+    `refill` to its own storage and returns [allowed, retry_after].
+    """
+
+    SCRIPT = """
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(retry_after)}
+"""
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        # Wall-clock time, so every worker and host agrees on when a bucket was last touched
+        allowed, retry_after = await self.client.eval(
+            self.SCRIPT, 1, self.prefix + key, limit.burst, limit.rate, time.time()
+        )
+        return bool(int(allowed)), float(retry_after)
+
+
+class RateLimiter:
+    def __init__(self, backend, enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.enabled = enabled
+        self.allowed = 0
+        self.rejected: Dict[str, int] = {name: 0 for name in LIMITS}
+        self.errors = 0
+
+    async def check(self, name: str, key: str):
+        """Raise 429 with Retry-After once `key` has used up the `name` limit."""
+        try:
+            allowed, retry_after = await self.backend.take(f"{name}:{key}", LIMITS[name])
+        except Exception:
+            # An unreachable shared backend must not take the endpoints down with it
+            self.errors += 1
+            logger.exception("Rate limit backend failed; allowing the request")
+            return
+        if allowed:
+            self.allowed += 1
+            return
+        self.rejected[name] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "allowed": self.allowed, "rejected": dict(self.rejected), "errors": self.errors}
+
+
+def client_key(request: Request, limit: Limit) -> str:
+    if limit.per_user:
+        scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+        username = token_username(token) if scheme.lower() == "bearer" and token else None
+        if username is not None:
+            return "user:" + username
+    # Behind a proxy, uvicorn's --proxy-headers sets this from X-Forwarded-For
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def rate_limit(name: str):
+    """Dependency enforcing LIMITS[name]; add it to the route decorator's `dependencies`."""
+    limit = LIMITS[name]
+
+    async def check(request: Request):
+        if rate_limiter.enabled:
+            await rate_limiter.check(name, client_key(request, limit))
+
+    return check
+
+
+def _make_backend():
+    if RATE_LIMIT_BACKEND == "redis":
+        import redis.asyncio as redis
+        return SharedBackend(redis.from_url(RATE_LIMIT_URL))
+    return MemoryBackend()
+
+
+rate_limiter = RateLimiter(_make_backend())
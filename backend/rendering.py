@@ -0,0 +1,128 @@
+import hashlib
+import io
+import os
+import re
+from html import escape
+from typing import List
+
+from analysis import HEADING, unique_anchor
+
+# Post content rendered to HTML once, at write time. Every piece of source
+# text is escaped and the only markup in the output is what this module
+# emits, so the stored HTML is safe to inject as-is. Supported: "# Heading"
+# lines (with anchors matching BlogPost.outline), ``` fenced code blocks
+# highlighted with Pygments, `inline code` and bare http(s) links; every
+# other non-empty line is a paragraph, as the frontend showed it before.
+
+# Bump when the generated markup changes; stored posts are re-rendered by
+# `python backfill.py render`
+RENDERER_REVISION = 1
+CODE_STYLE = os.getenv("CODE_STYLE", "monokai")
+
+_INLINE = re.compile(r"`([^`]+)`|(https?://[^\s<>\"'`]+)")
+
+
+def _version() -> str:
+    try:
+        import pygments
+        pygments_version = pygments.__version__
+    except ImportError:
+        pygments_version = "none"
+    key = f"{RENDERER_REVISION}:{pygments_version}:{CODE_STYLE}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+RENDER_VERSION = _version()
+
+
+def _inline(text: str) -> str:
+    out = []
+    pos = 0
+    for match in _INLINE.finditer(text):
+        out.append(escape(text[pos:match.start()]))
+        code, url = match.groups()
+        if code is not None:
+            out.append(f"<code>{escape(code)}</code>")
+        else:
+            href = escape(url)
+            out.append(f'<a href="{href}" rel="nofollow noopener" target="_blank">{href}</a>')
+        pos = match.end()
+    out.append(escape(text[pos:]))
+    return "".join(out)
+
+
+def _highlight(code: str, language: str) -> str:
+    try:
+        from pygments import highlight
+        from pygments.formatters import HtmlFormatter
+        from pygments.lexers import TextLexer, get_lexer_by_name
+        from pygments.util import ClassNotFound
+    except ImportError:
+        return f"<pre><code>{escape(code)}</code></pre>"
+    try:
+        lexer = get_lexer_by_name(language) if language else TextLexer()
+    except ClassNotFound:
+        lexer = TextLexer()
+    # Inline styles, so the HTML needs no companion stylesheet
+    return highlight(code, lexer, HtmlFormatter(noclasses=True, style=CODE_STYLE))
+
+
+def _toc(outline: List[dict]) -> str:
+    """Nested list of links to the headings, relative to the shallowest level used."""
+    if not outline:
+        return ""
+    base = min(entry["level"] for entry in outline) - 1
+    html = ['<nav class="toc">']
+    depth = 0
+    for entry in outline:
+        level = entry["level"] - base
+        if level > depth:
+            html.append("<ul><li>" * (level - depth))
+        else:
+            html.append("</li>")
+            html.append("</ul></li>" * (depth - level))
+            html.append("<li>")
+        depth = level
+        html.append(f'<a href="#{entry["anchor"]}">{escape(entry["text"])}</a>')
+    html.append("</li>" + "</ul></li>" * (depth - 1) + "</ul></nav>")
+    return "".join(html)
+
+
+def render(content: str) -> dict:
+    """Sanitized HTML and table of contents for a post; keys match BlogPost columns."""
+    parts = []
+    outline = []
+    anchors = set()
+    code = None
+    language = ""
+
+    for line in io.StringIO(content):
+        stripped = line.strip()
+        if code is not None:
+            if stripped.startswith("```"):
+                parts.append(_highlight("".join(code), language))
+                code = None
+            else:
+                code.append(line)
+            continue
+        if stripped.startswith("```"):
+            code = []
+            language = stripped[3:].strip().split(" ", 1)[0]
+            continue
+        if not stripped:
+            continue
+        heading = HEADING.match(stripped)
+        if heading:
+            text = heading.group(2)
+            level = len(heading.group(1))
+            anchor = unique_anchor(text, anchors)
+            outline.append({"level": level, "text": text, "anchor": anchor})
+            # The post title is the page's h1, so headings start at h2
+            tag = f"h{min(level + 1, 6)}"
+            parts.append(f'<{tag} id="{anchor}">{_inline(text)}</{tag}>')
+        else:
+            parts.append(f"<p>{_inline(stripped)}</p>")
+    if code is not None:
+        parts.append(_highlight("".join(code), language))
+
+    return {"content_html": "\n".join(parts), "toc_html": _toc(outline), "render_version": RENDER_VERSION}
@@ -5,15 +5,16 @@ from sqlalchemy.future import select
 from database import get_db
 from models import User
 from schemas import UserCreate, User as UserSchema, Token
-from auth import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import get_operator, hash_password, verify_and_update_password, password_hash_stats, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from datetime import timedelta
+from ratelimit import rate_limit
 
 router = APIRouter(
     prefix="/auth",
     tags=["auth"]
 )
 
-@router.post("/register", response_model=UserSchema)
+@router.post("/register", response_model=UserSchema, dependencies=[Depends(rate_limit("register"))])
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.username == user.username))
     if result.scalars().first():
@@ -24,7 +25,7 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     if result.scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     is_admin = True if user.username.lower() == "admin" else False
     new_user = User(username=user.username, email=user.email, hashed_password=hashed_password, is_admin=is_admin)
     try:
@@ -37,12 +38,14 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Registration failed. User may already exist.")
     return new_user
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login"))])
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.username == form_data.username))
     user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if user:
+        verified, new_hash = await verify_and_update_password(form_data.password, user.hashed_password)
+    if not user or not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -51,6 +54,15 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "is_admin": user.is_admin}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id, "email": user.email, "is_admin": user.is_admin},
+        expires_delta=access_token_expires
     )
+    if new_hash:
+        # Stored hash used a different bcrypt cost; upgrade it transparently
+        user.hashed_password = new_hash
+        await db.commit()
     return {"access_token": access_token, "token_type": "bearer"}
+
+@router.get("/stats", dependencies=[Depends(get_operator)])
+async def hash_stats():
+    return password_hash_stats()
@@ -1,136 +1,300 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response, BackgroundTasks
+from fastapi.responses import HTMLResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Optional
-from database import get_db
-from models import BlogPost, User, Tag
+from sqlalchemy.orm import defer, selectinload, load_only
+from typing import List, Optional, Union
+from database import get_db, dialect_insert
+from models import BlogPost, Tag
 import models
-from schemas import BlogPost as BlogPostSchema
-from auth import get_current_user, get_current_admin_user
-import shutil
-import os
-import uuid
-import math
+from schemas import BlogPost as BlogPostSchema, BlogPostDetail, BlogPostSummaryPage, User as UserSchema
+from auth import get_current_user, get_current_admin_user, get_optional_user
+from cache import response_cache, json_entry, entity_tag
+from claps import clap_buffer
+from events import event_hub
+from ratelimit import rate_limit
+from rankings import add_ranking, rankings, sorted_page
+from comments import attach_latest
+from likes import personalizer
+from uploads import save_upload, upload_url
+from images import process_image
+import search as search_index
+from analysis import analyze
+from rendering import render
 
 router = APIRouter(
     prefix="/blog",
     tags=["blog"]
 )
 
-@router.get("/", response_model=List[BlogPostSchema])
-async def get_blogs(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    # Eager load tags, comments, and likes
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(BlogPost)
-        .options(
-            selectinload(BlogPost.tags),
-            selectinload(BlogPost.comments).selectinload(models.BlogComment.user),
-            selectinload(BlogPost.likes)
-        )
-        .offset(skip)
-        .limit(limit)
-        .order_by(BlogPost.created_at.desc())
+def normalize_tag(name: str) -> str:
+    return " ".join(name.lower().split())
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Comma separated form value -> unique normalized names, in order."""
+    names = (normalize_tag(t) for t in (tags or "").split(","))
+    return list(dict.fromkeys(name for name in names if name))
+
+async def resolve_tags(db: AsyncSession, names: List[str]) -> List[int]:
+    """Ids for the given tag names, creating missing tags in one statement.
+
+    ON CONFLICT DO NOTHING lets concurrent posts introduce the same new tag
+    without racing on the unique constraint.
+    """
+    if not names:
+        return []
+    await db.execute(
+        dialect_insert(Tag).values([{"name": name} for name in names]).on_conflict_do_nothing(index_elements=["name"])
     )
-    blogs = result.scalars().unique().all()
-    return blogs
+    result = await db.execute(select(Tag.id).where(Tag.name.in_(names)))
+    return result.scalars().all()
+
+def process_content(content: str) -> dict:
+    """Column values derived from a post body: stats plus rendered HTML."""
+    return {**analyze(content), **render(content)}
+
+@router.get("/", response_model=Union[List[BlogPostSchema], BlogPostSummaryPage])
+async def get_blogs(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    sort: str = Query("recent", pattern="^(recent|trending|popular)$"),
+    tag: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    viewer: Optional[UserSchema] = Depends(get_optional_user)
+):
+    conditions = []
+    if tag:
+        # Served by ix_blog_tags_tag_id_blog_id
+        tagged = (
+            select(models.blog_tags.c.blog_id)
+            .join(Tag, Tag.id == models.blog_tags.c.tag_id)
+            .where(Tag.name == normalize_tag(tag))
+        )
+        conditions.append(BlogPost.id.in_(tagged))
+
+    async def build():
+        if view == "summary":
+            query = (
+                select(BlogPost)
+                .options(
+                    load_only(
+                        BlogPost.id, BlogPost.title, BlogPost.subtitle, BlogPost.image_url, BlogPost.image_variants,
+                        BlogPost.created_at, BlogPost.claps, BlogPost.reading_time, BlogPost.word_count, BlogPost.excerpt,
+                        BlogPost.likes_count, BlogPost.comments_count
+                    ),
+                    selectinload(BlogPost.tags)
+                )
+            )
+            rows, cursor_out = await sorted_page(db, query.where(*conditions), BlogPost, "blog", sort, cursor, limit)
+            return json_entry(BlogPostSummaryPage, {"items": rows, "next_cursor": cursor_out}, fast=True)
+
+        # Full view keeps the plain list body; the cursor for the next page is sent as a header.
+        # Outline and rendered HTML are only in the single-post responses.
+        query = (
+            select(BlogPost)
+            .options(defer(BlogPost.outline), defer(BlogPost.content_html), defer(BlogPost.toc_html), selectinload(BlogPost.tags))
+            .where(*conditions)
+        )
+        blogs, cursor_out = await sorted_page(db, query, BlogPost, "blog", sort, cursor, limit)
+        await attach_latest(db, models.BlogComment, models.BlogComment.blog_id, blogs)
+        headers = {"Vary": "Authorization"}
+        if cursor_out:
+            headers["X-Next-Cursor"] = cursor_out
+        return json_entry(List[BlogPostSchema], blogs, headers, refs=[row.id for row in blogs], fast=True)
 
-@router.post("/", response_model=BlogPostSchema)
+    # Only the full view carries is_liked
+    personalize = personalizer(db, "blog", viewer) if view == "full" else None
+    # Ranked orders also change when the rankings are flushed
+    tags = ["blog:list"] if sort == "recent" else ["blog:list", "blog:ranking"]
+    return await response_cache.serve(request, build, tags=tags, personalize=personalize)
+
+@router.post("/", response_model=BlogPostDetail)
 async def create_blog(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     subtitle: Optional[str] = Form(None),
     content: str = Form(...),
     tags: Optional[str] = Form(None), # Comma separated tags
     image: Optional[UploadFile] = File(None),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: UserSchema = Depends(get_current_admin_user)
 ):
     image_url = None
+    image_filename = None
     if image:
-        file_extension = image.filename.split(".")[-1]
-        filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = f"uploads/{filename}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        
-        image_url = f"http://localhost:8000/uploads/{filename}"
-
-    # Calculate reading time (approx 200 words per minute)
-    word_count = len(content.split())
-    reading_time = math.ceil(word_count / 200)
+        image_filename = await save_upload(image)
+        image_url = upload_url(image_filename)
+
+    # Stats for list views and the rendered HTML, stored with the post
+    stats = await run_in_threadpool(process_content, content)
 
     new_blog = BlogPost(
         title=title, 
         subtitle=subtitle,
         content=content, 
         image_url=image_url, 
-        reading_time=reading_time,
-        owner_id=current_user.id
+        owner_id=current_user.id,
+        **stats
     )
 
-    if tags:
-        tag_list = [t.strip() for t in tags.split(",") if t.strip()]
-        for tag_name in tag_list:
-            # Check if tag exists
-            result = await db.execute(select(Tag).where(Tag.name == tag_name))
-            tag = result.scalars().first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.add(tag)
-                # Need to flush to get ID if we were using it, but here we just append object
-            new_blog.tags.append(tag)
+    tag_names = parse_tags(tags)
 
     db.add(new_blog)
+    await db.flush()
+    tag_ids = await resolve_tags(db, tag_names)
+    if tag_ids:
+        await db.execute(insert(models.blog_tags), [{"blog_id": new_blog.id, "tag_id": tag_id} for tag_id in tag_ids])
+    await search_index.index_blog(db, new_blog, tag_names)
+    await add_ranking(db, "blog", new_blog.id, new_blog.created_at)
     await db.commit()
     await db.refresh(new_blog)
     
     # Reload with tags to return correct schema
-    from sqlalchemy.orm import selectinload
     result = await db.execute(
-        select(BlogPost)
-        .options(
-            selectinload(BlogPost.tags),
-            selectinload(BlogPost.comments).selectinload(models.BlogComment.user),
-            selectinload(BlogPost.likes)
-        )
-        .where(BlogPost.id == new_blog.id)
+        select(BlogPost).options(selectinload(BlogPost.tags)).where(BlogPost.id == new_blog.id)
     )
     new_blog = result.scalars().first()
-    
+    await response_cache.invalidate("blog:list", "search", "tags")
+    if image_filename:
+        background_tasks.add_task(process_image, BlogPost, new_blog.id, image_filename, "blog:list", f"blog:{new_blog.id}")
     return new_blog
 
-@router.get("/{blog_id}", response_model=BlogPostSchema)
-async def get_blog(blog_id: int, db: AsyncSession = Depends(get_db)):
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(BlogPost)
-        .options(
-            selectinload(BlogPost.tags),
-            selectinload(BlogPost.comments).selectinload(models.BlogComment.user),
-            selectinload(BlogPost.likes)
+@router.get("/{blog_id}", response_model=BlogPostDetail)
+async def get_blog(
+    blog_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    viewer: Optional[UserSchema] = Depends(get_optional_user)
+):
+    async def build():
+        result = await db.execute(
+            select(BlogPost).options(selectinload(BlogPost.tags)).where(BlogPost.id == blog_id)
         )
-        .where(BlogPost.id == blog_id)
+        blog = result.scalars().first()
+        if blog is None:
+            raise HTTPException(status_code=404, detail="Blog not found")
+        await attach_latest(db, models.BlogComment, models.BlogComment.blog_id, [blog])
+        return json_entry(BlogPostDetail, blog, {"Vary": "Authorization"}, refs=[blog.id], fast=True)
+
+    return await response_cache.serve(request, build, tags=[f"blog:{blog_id}"], personalize=personalizer(db, "blog", viewer))
+
+@router.get("/{blog_id}/html", response_class=HTMLResponse)
+async def get_blog_html(blog_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Pre-rendered table of contents and content as an HTML fragment.
+
+    The ETag is the content hash plus renderer version, so a revalidation
+    is answered without reading the HTML itself.
+    """
+    result = await db.execute(
+        select(BlogPost.content_hash, BlogPost.render_version).where(BlogPost.id == blog_id)
     )
-    blog = result.scalars().first()
-    if blog is None:
+    row = result.first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Blog not found")
-    return blog
 
-@router.post("/{blog_id}/clap")
-async def clap_blog(blog_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(BlogPost).where(BlogPost.id == blog_id))
+    if row.content_hash and row.render_version:
+        etag = f'"{row.content_hash}-{row.render_version}"'
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag})
+        result = await db.execute(
+            select(BlogPost.toc_html, BlogPost.content_html).where(BlogPost.id == blog_id)
+        )
+        toc_html, content_html = result.first()
+        body = (toc_html or "") + content_html
+    else:
+        # Not rendered yet (until the backfill runs); render without storing
+        result = await db.execute(select(BlogPost.content).where(BlogPost.id == blog_id))
+        rendered = await run_in_threadpool(render, result.scalar() or "")
+        body = rendered["toc_html"] + rendered["content_html"]
+        etag = entity_tag(body.encode())
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag})
+    return HTMLResponse(body, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@router.patch("/{blog_id}", response_model=BlogPostDetail)
+async def update_blog(
+    blog_id: int,
+    background_tasks: BackgroundTasks,
+    title: Optional[str] = Form(None),
+    subtitle: Optional[str] = Form(None),
+    content: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None), # Comma separated; replaces the current tags
+    image: Optional[UploadFile] = File(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_admin_user)
+):
+    # Only the fields sent are changed
+    result = await db.execute(select(BlogPost).options(selectinload(BlogPost.tags)).where(BlogPost.id == blog_id))
     blog = result.scalars().first()
     if blog is None:
         raise HTTPException(status_code=404, detail="Blog not found")
-    
-    blog.claps += 1
+    if blog.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to edit this blog")
+
+    if title is not None:
+        blog.title = title
+    if subtitle is not None:
+        blog.subtitle = subtitle or None
+    if content is not None:
+        stats = await run_in_threadpool(process_content, content)
+        if stats["content_hash"] != blog.content_hash:
+            blog.content = content
+            for column, value in stats.items():
+                setattr(blog, column, value)
+
+    image_filename = None
+    if image:
+        image_filename = await save_upload(image)
+        blog.image_url = upload_url(image_filename)
+        blog.image_variants = None
+
+    if tags is not None:
+        tag_names = parse_tags(tags)
+        await db.execute(delete(models.blog_tags).where(models.blog_tags.c.blog_id == blog_id))
+        tag_ids = await resolve_tags(db, tag_names)
+        if tag_ids:
+            await db.execute(insert(models.blog_tags), [{"blog_id": blog_id, "tag_id": tag_id} for tag_id in tag_ids])
+    else:
+        tag_names = [tag.name for tag in blog.tags]
+
+    await db.flush()
+    await search_index.index_blog(db, blog, tag_names)
     await db.commit()
-    await db.refresh(blog)
-    return {"claps": blog.claps}
+
+    result = await db.execute(
+        select(BlogPost)
+        .options(selectinload(BlogPost.tags))
+        .where(BlogPost.id == blog_id)
+        .execution_options(populate_existing=True)
+    )
+    blog = result.scalars().first()
+    await attach_latest(db, models.BlogComment, models.BlogComment.blog_id, [blog])
+    await response_cache.invalidate("blog:list", f"blog:{blog_id}", "search", "tags")
+    if image_filename:
+        background_tasks.add_task(process_image, BlogPost, blog_id, image_filename, "blog:list", f"blog:{blog_id}")
+    return blog
+
+@router.post("/{blog_id}/clap", dependencies=[Depends(rate_limit("clap"))])
+async def clap_blog(blog_id: int, db: AsyncSession = Depends(get_db)):
+    # Claps are buffered and written in batches; only the first clap on a post
+    # since startup touches the database, to check it exists and read its count
+    if not clap_buffer.is_known(blog_id):
+        result = await db.execute(select(BlogPost.claps).where(BlogPost.id == blog_id))
+        claps = result.first()
+        if claps is None:
+            raise HTTPException(status_code=404, detail="Blog not found")
+        clap_buffer.remember(blog_id, claps[0] or 0)
+    claps = clap_buffer.add(blog_id)
+    rankings.record("blog", blog_id, "clap")
+    event_hub.publish(f"blog:{blog_id}", {"claps": claps})
+    return {"claps": claps}
 
 @router.delete("/{blog_id}")
-async def delete_blog(blog_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+async def delete_blog(blog_id: int, db: AsyncSession = Depends(get_db), current_user: UserSchema = Depends(get_current_admin_user)):
     result = await db.execute(select(BlogPost).where(BlogPost.id == blog_id))
     blog = result.scalars().first()
     if blog is None:
@@ -139,5 +303,8 @@ async def delete_blog(blog_id: int, db: AsyncSession = Depends(get_db), current_
         raise HTTPException(status_code=403, detail="Not authorized to delete this blog")
     
     await db.delete(blog)
+    await search_index.remove_document(db, "blog", blog_id)
     await db.commit()
+    clap_buffer.forget(blog_id)
+    await response_cache.invalidate("blog:list", f"blog:{blog_id}", "search", "tags")
     return {"message": "Blog deleted successfully"}
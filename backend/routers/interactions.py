@@ -1,151 +1,283 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, update, delete, literal, case
+from datetime import datetime
+from typing import List, Optional
 import database, models, schemas, auth
+from cache import response_cache, json_entry
+from claps import clap_buffer
+from comments import check_parent, comment_page
+from events import event_hub
+from likes import like_cache
+from ratelimit import rate_limit
+from rankings import rankings
 
 router = APIRouter(
     tags=["Interactions"]
 )
 
+# Likes and comments keep BlogPost/Project.likes_count and comments_count in
+# step with the rows they count. Counters are only ever changed in SQL
+# (col = col + n) inside the same transaction as the row change. After each
+# commit the new counts are published to the post's live event stream and
+# the interaction is counted towards the rankings.
+
+# Headers for SSE responses; X-Accel-Buffering stops nginx holding events back
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def comment_event(comment: schemas.Comment) -> dict:
+    return comment.model_dump(mode="json")
+
+async def open_stream(topic: str, snapshot_query, not_found: str, resync: bool, adjust=None):
+    event_hub.check_capacity()
+    # Short-lived session: a stream must not hold a pooled connection while it is open
+    async with database.SessionLocal() as db:
+        row = (await db.execute(snapshot_query)).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    snapshot = dict(row)
+    if adjust is not None:
+        adjust(snapshot)
+    if resync:
+        # Reconnecting client may have missed comments
+        snapshot["resync"] = True
+    return StreamingResponse(
+        event_hub.stream(topic, snapshot), media_type="text/event-stream", headers=EVENT_STREAM_HEADERS
+    )
+
 # --- Blog Interactions ---
 
-@router.post("/blog/{blog_id}/comment", response_model=schemas.Comment)
+@router.get("/blog/{blog_id}/events")
+async def blog_events(blog_id: int, request: Request):
+    # Server-sent events: the current counts, then changes to them and new comments
+    query = select(
+        models.BlogPost.likes_count, models.BlogPost.claps, models.BlogPost.comments_count
+    ).where(models.BlogPost.id == blog_id)
+
+    def adjust(snapshot):
+        snapshot["claps"] = clap_buffer.estimate(blog_id, snapshot["claps"] or 0)
+
+    return await open_stream(
+        f"blog:{blog_id}", query, "Blog not found", "last-event-id" in request.headers, adjust
+    )
+
+@router.get("/blog/{blog_id}/comments", response_model=schemas.CommentPage)
+async def get_blog_comments(
+    blog_id: int,
+    request: Request,
+    parent_id: Optional[int] = None, # List replies to this comment instead of top-level comments
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(database.get_db)
+):
+    async def build():
+        result = await db.execute(select(models.BlogPost.id).where(models.BlogPost.id == blog_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Blog not found")
+        page = await comment_page(db, models.BlogComment, models.BlogComment.blog_id, blog_id, parent_id, cursor, limit)
+        return json_entry(schemas.CommentPage, page, fast=True)
+
+    return await response_cache.serve(request, build, tags=[f"blog:{blog_id}"])
+
+@router.post("/blog/{blog_id}/comment", response_model=schemas.Comment, dependencies=[Depends(rate_limit("comment"))])
 async def create_blog_comment(
     blog_id: int,
     comment: schemas.CommentCreate,
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.User = Depends(auth.get_current_user)
 ):
-    result = await db.execute(select(models.BlogPost).filter(models.BlogPost.id == blog_id))
-    blog = result.scalar_one_or_none()
-    if not blog:
-        raise HTTPException(status_code=404, detail="Blog not found")
-    
-    # Capture user data before commit to avoid expiration/lazy-load issues
-    user_dto = schemas.User(
-        id=current_user.id,
-        username=current_user.username,
-        email=current_user.email,
-        is_admin=current_user.is_admin
+    if comment.parent_id is not None:
+        await check_parent(db, models.BlogComment, models.BlogComment.blog_id, blog_id, comment.parent_id)
+    result = await db.execute(
+        update(models.BlogPost)
+        .where(models.BlogPost.id == blog_id)
+        .values(comments_count=models.BlogPost.comments_count + 1)
+        .returning(models.BlogPost.comments_count)
     )
+    comments_count = result.scalar_one_or_none()
+    if comments_count is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Blog not found")
 
     new_comment = models.BlogComment(
         content=comment.content,
         user_id=current_user.id,
-        blog_id=blog_id
+        blog_id=blog_id,
+        parent_id=comment.parent_id
     )
     db.add(new_comment)
-    await db.commit()
-    await db.refresh(new_comment)
-    
-    # Return constructed response with pre-captured user data
-    return schemas.Comment(
+    await db.flush()
+    response = schemas.Comment(
         id=new_comment.id,
         content=new_comment.content,
         created_at=new_comment.created_at,
         user_id=new_comment.user_id,
-        user=user_dto
+        parent_id=new_comment.parent_id,
+        user=schemas.PublicUser.model_validate(current_user)
     )
+    await db.commit()
+    await response_cache.invalidate("blog:list", f"blog:{blog_id}")
+    rankings.record("blog", blog_id, "comment")
+    event_hub.publish(f"blog:{blog_id}", {"comments_count": comments_count, "comments": [comment_event(response)]})
+    return response
 
-@router.post("/blog/{blog_id}/like")
+@router.post("/blog/{blog_id}/like", dependencies=[Depends(rate_limit("like"))])
 async def like_blog(
     blog_id: int,
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.User = Depends(auth.get_current_user)
 ):
-    result = await db.execute(select(models.BlogPost).filter(models.BlogPost.id == blog_id))
-    blog = result.scalar_one_or_none()
-    if not blog:
-        raise HTTPException(status_code=404, detail="Blog not found")
-    
-    result = await db.execute(select(models.BlogLike).filter(
+    # Unlike if a like row exists, otherwise insert one; each is a single statement
+    result = await db.execute(delete(models.BlogLike).where(
         models.BlogLike.blog_id == blog_id,
         models.BlogLike.user_id == current_user.id
     ))
-    existing_like = result.scalar_one_or_none()
-
-    if existing_like:
-        # Unlike
-        db.delete(existing_like)
-        # Update claps count for backward compatibility
-        blog.claps = max(0, blog.claps - 1)
-        await db.commit()
-        return {"message": "Unliked", "likes_count": len(blog.likes), "is_liked": False}
+    if result.rowcount:
+        is_liked, delta = False, -1
     else:
-        # Like
-        new_like = models.BlogLike(user_id=current_user.id, blog_id=blog_id)
-        db.add(new_like)
-        # Update claps count
-        blog.claps += 1
-        await db.commit()
-        return {"message": "Liked", "likes_count": len(blog.likes), "is_liked": True}
+        # INSERT ... SELECT only inserts when the post exists; a concurrent like wins the conflict
+        result = await db.execute(
+            database.dialect_insert(models.BlogLike)
+            .from_select(
+                ["user_id", "blog_id", "created_at"],
+                select(literal(current_user.id), models.BlogPost.id, literal(datetime.utcnow()))
+                .where(models.BlogPost.id == blog_id)
+            )
+            .on_conflict_do_nothing()
+        )
+        is_liked, delta = True, result.rowcount
+
+    # claps mirrors likes for backward compatibility with older clients
+    claps = models.BlogPost.claps + delta
+    result = await db.execute(
+        update(models.BlogPost)
+        .where(models.BlogPost.id == blog_id)
+        .values(
+            likes_count=models.BlogPost.likes_count + delta,
+            claps=case((claps < 0, 0), else_=claps)
+        )
+        .returning(models.BlogPost.likes_count)
+    )
+    likes_count = result.scalar_one_or_none()
+    if likes_count is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Blog not found")
+    await db.commit()
+    like_cache.record("blog", current_user.id, blog_id, is_liked)
+    if delta:
+        rankings.record("blog", blog_id, "like" if is_liked else "unlike")
+    await response_cache.invalidate("blog:list", f"blog:{blog_id}")
+    event_hub.publish(f"blog:{blog_id}", {"likes_count": likes_count})
+    return {"message": "Liked" if is_liked else "Unliked", "likes_count": likes_count, "is_liked": is_liked}
 
 # --- Project Interactions ---
 
-@router.post("/projects/{project_id}/comment", response_model=schemas.Comment)
+@router.get("/projects/{project_id}/events")
+async def project_events(project_id: int, request: Request):
+    query = select(models.Project.likes_count, models.Project.comments_count).where(models.Project.id == project_id)
+    return await open_stream(f"project:{project_id}", query, "Project not found", "last-event-id" in request.headers)
+
+@router.get("/projects/{project_id}/comments", response_model=schemas.CommentPage)
+async def get_project_comments(
+    project_id: int,
+    request: Request,
+    parent_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(database.get_db)
+):
+    async def build():
+        result = await db.execute(select(models.Project.id).where(models.Project.id == project_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        page = await comment_page(
+            db, models.ProjectComment, models.ProjectComment.project_id, project_id, parent_id, cursor, limit
+        )
+        return json_entry(schemas.CommentPage, page, fast=True)
+
+    return await response_cache.serve(request, build, tags=[f"project:{project_id}"])
+
+@router.post("/projects/{project_id}/comment", response_model=schemas.Comment, dependencies=[Depends(rate_limit("comment"))])
 async def create_project_comment(
     project_id: int,
     comment: schemas.CommentCreate,
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.User = Depends(auth.get_current_user)
 ):
-    result = await db.execute(select(models.Project).filter(models.Project.id == project_id))
-    project = result.scalar_one_or_none()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Capture user data before commit to avoid expiration/lazy-load issues
-    user_dto = schemas.User(
-        id=current_user.id,
-        username=current_user.username,
-        email=current_user.email,
-        is_admin=current_user.is_admin
+    if comment.parent_id is not None:
+        await check_parent(db, models.ProjectComment, models.ProjectComment.project_id, project_id, comment.parent_id)
+    result = await db.execute(
+        update(models.Project)
+        .where(models.Project.id == project_id)
+        .values(comments_count=models.Project.comments_count + 1)
+        .returning(models.Project.comments_count)
     )
+    comments_count = result.scalar_one_or_none()
+    if comments_count is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Project not found")
 
     new_comment = models.ProjectComment(
         content=comment.content,
         user_id=current_user.id,
-        project_id=project_id
+        project_id=project_id,
+        parent_id=comment.parent_id
     )
     db.add(new_comment)
-    await db.commit()
-    await db.refresh(new_comment)
-    
-    # Return constructed response with pre-captured user data
-    return schemas.Comment(
+    await db.flush()
+    response = schemas.Comment(
         id=new_comment.id,
         content=new_comment.content,
         created_at=new_comment.created_at,
         user_id=new_comment.user_id,
-        user=user_dto
+        parent_id=new_comment.parent_id,
+        user=schemas.PublicUser.model_validate(current_user)
     )
+    await db.commit()
+    await response_cache.invalidate("project:list", f"project:{project_id}")
+    rankings.record("project", project_id, "comment")
+    event_hub.publish(f"project:{project_id}", {"comments_count": comments_count, "comments": [comment_event(response)]})
+    return response
 
-@router.post("/projects/{project_id}/like")
+@router.post("/projects/{project_id}/like", dependencies=[Depends(rate_limit("like"))])
 async def like_project(
     project_id: int,
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.User = Depends(auth.get_current_user)
 ):
-    result = await db.execute(select(models.Project).filter(models.Project.id == project_id))
-    project = result.scalar_one_or_none()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    result = await db.execute(select(models.ProjectLike).filter(
+    result = await db.execute(delete(models.ProjectLike).where(
         models.ProjectLike.project_id == project_id,
         models.ProjectLike.user_id == current_user.id
     ))
-    existing_like = result.scalar_one_or_none()
-
-    if existing_like:
-        # Unlike
-        db.delete(existing_like)
-        await db.commit()
-        return {"message": "Unliked", "likes_count": len(project.likes), "is_liked": False}
+    if result.rowcount:
+        is_liked, delta = False, -1
     else:
-        # Like
-        new_like = models.ProjectLike(user_id=current_user.id, project_id=project_id)
-        db.add(new_like)
-        await db.commit()
-        return {"message": "Liked", "likes_count": len(project.likes), "is_liked": True}
+        result = await db.execute(
+            database.dialect_insert(models.ProjectLike)
+            .from_select(
+                ["user_id", "project_id", "created_at"],
+                select(literal(current_user.id), models.Project.id, literal(datetime.utcnow()))
+                .where(models.Project.id == project_id)
+            )
+            .on_conflict_do_nothing()
+        )
+        is_liked, delta = True, result.rowcount
+
+    result = await db.execute(
+        update(models.Project)
+        .where(models.Project.id == project_id)
+        .values(likes_count=models.Project.likes_count + delta)
+        .returning(models.Project.likes_count)
+    )
+    likes_count = result.scalar_one_or_none()
+    if likes_count is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Project not found")
+    await db.commit()
+    like_cache.record("project", current_user.id, project_id, is_liked)
+    if delta:
+        rankings.record("project", project_id, "like" if is_liked else "unlike")
+    await response_cache.invalidate("project:list", f"project:{project_id}")
+    event_hub.publish(f"project:{project_id}", {"likes_count": likes_count})
+    return {"message": "Liked" if is_liked else "Unliked", "likes_count": likes_count, "is_liked": is_liked}
@@ -1,55 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Optional
+from sqlalchemy.orm import load_only
+from typing import List, Optional, Union
 from database import get_db
-from models import Project, User
-from schemas import Project as ProjectSchema
-from auth import get_current_user, get_current_admin_user
-import shutil
-import os
-import uuid
+from models import Project
+import models
+from schemas import Project as ProjectSchema, ProjectSummaryPage, User as UserSchema
+from auth import get_current_user, get_current_admin_user, get_optional_user
+from cache import response_cache, json_entry
+from comments import attach_latest
+from likes import personalizer
+from rankings import add_ranking, rankings, sorted_page
+from uploads import save_upload, upload_url
+from images import process_image
+import search as search_index
 
 router = APIRouter(
     prefix="/projects",
     tags=["projects"]
 )
 
-@router.get("/", response_model=List[ProjectSchema])
-async def get_projects(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(Project)
-        .options(
-            selectinload(Project.comments).selectinload(models.ProjectComment.user),
-            selectinload(Project.likes)
-        )
-        .offset(skip)
-        .limit(limit)
-    )
-    projects = result.scalars().unique().all()
-    return projects
+@router.get("/", response_model=Union[List[ProjectSchema], ProjectSummaryPage])
+async def get_projects(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    sort: str = Query("recent", pattern="^(recent|trending|popular)$"),
+    db: AsyncSession = Depends(get_db),
+    viewer: Optional[UserSchema] = Depends(get_optional_user)
+):
+    async def build():
+        if view == "summary":
+            query = select(Project).options(
+                load_only(
+                    Project.id, Project.title, Project.description, Project.image_url, Project.image_variants,
+                    Project.project_url, Project.github_url, Project.created_at,
+                    Project.likes_count, Project.comments_count
+                )
+            )
+            rows, cursor_out = await sorted_page(db, query, Project, "project", sort, cursor, limit)
+            return json_entry(ProjectSummaryPage, {"items": rows, "next_cursor": cursor_out}, fast=True)
+
+        # Full view keeps the plain list body; the cursor for the next page is sent as a header
+        projects, cursor_out = await sorted_page(db, select(Project), Project, "project", sort, cursor, limit)
+        await attach_latest(db, models.ProjectComment, models.ProjectComment.project_id, projects)
+        headers = {"Vary": "Authorization"}
+        if cursor_out:
+            headers["X-Next-Cursor"] = cursor_out
+        return json_entry(List[ProjectSchema], projects, headers, refs=[row.id for row in projects], fast=True)
+
+    # Only the full view carries is_liked
+    personalize = personalizer(db, "project", viewer) if view == "full" else None
+    # Ranked orders also change when the rankings are flushed
+    tags = ["project:list"] if sort == "recent" else ["project:list", "project:ranking"]
+    return await response_cache.serve(request, build, tags=tags, personalize=personalize)
 
 @router.post("/", response_model=ProjectSchema)
 async def create_project(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     description: str = Form(...),
     project_url: Optional[str] = Form(None),
     github_url: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: UserSchema = Depends(get_current_admin_user)
 ):
     image_url = None
+    image_filename = None
     if image:
-        file_extension = image.filename.split(".")[-1]
-        filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = f"uploads/{filename}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        
-        image_url = f"http://localhost:8000/uploads/{filename}"
+        image_filename = await save_upload(image)
+        image_url = upload_url(image_filename)
 
     new_project = Project(
         title=title, 
@@ -60,41 +83,35 @@ async def create_project(
         owner_id=current_user.id
     )
     db.add(new_project)
+    await db.flush()
+    await search_index.index_project(db, new_project)
+    await add_ranking(db, "project", new_project.id, new_project.created_at)
     await db.commit()
     await db.refresh(new_project)
-    
-    # Reload with relationships
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(Project)
-        .options(
-            selectinload(Project.comments).selectinload(models.ProjectComment.user),
-            selectinload(Project.likes)
-        )
-        .where(Project.id == new_project.id)
-    )
-    new_project = result.scalars().first()
-    
+    await response_cache.invalidate("project:list", "search")
+    if image_filename:
+        background_tasks.add_task(process_image, Project, new_project.id, image_filename, "project:list", f"project:{new_project.id}")
     return new_project
 
 @router.get("/{project_id}", response_model=ProjectSchema)
-async def get_project(project_id: int, db: AsyncSession = Depends(get_db)):
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(Project)
-        .options(
-            selectinload(Project.comments).selectinload(models.ProjectComment.user),
-            selectinload(Project.likes)
-        )
-        .where(Project.id == project_id)
-    )
-    project = result.scalars().first()
-    if project is None:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return project
+async def get_project(
+    project_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    viewer: Optional[UserSchema] = Depends(get_optional_user)
+):
+    async def build():
+        result = await db.execute(select(Project).where(Project.id == project_id))
+        project = result.scalars().first()
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        await attach_latest(db, models.ProjectComment, models.ProjectComment.project_id, [project])
+        return json_entry(ProjectSchema, project, {"Vary": "Authorization"}, refs=[project.id], fast=True)
+
+    return await response_cache.serve(request, build, tags=[f"project:{project_id}"], personalize=personalizer(db, "project", viewer))
 
 @router.delete("/{project_id}")
-async def delete_project(project_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+async def delete_project(project_id: int, db: AsyncSession = Depends(get_db), current_user: UserSchema = Depends(get_current_admin_user)):
     result = await db.execute(select(Project).where(Project.id == project_id))
     project = result.scalars().first()
     if project is None:
@@ -103,5 +120,7 @@ async def delete_project(project_id: int, db: AsyncSession = Depends(get_db), cu
         raise HTTPException(status_code=403, detail="Not authorized to delete this project")
     
     await db.delete(project)
+    await search_index.remove_document(db, "project", project_id)
     await db.commit()
+    await response_cache.invalidate("project:list", f"project:{project_id}", "search")
     return {"message": "Project deleted successfully"}
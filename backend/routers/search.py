@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from database import get_db
+from schemas import SearchPage
+from cache import response_cache, json_entry
+import search as search_index
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"]
+)
+
+@router.get("", response_model=SearchPage)
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    async def build():
+        page = await search_index.search(db, q, limit, cursor)
+        return json_entry(SearchPage, page, fast=True)
+
+    return await response_cache.serve(request, build, tags=["search"])
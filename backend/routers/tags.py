@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List
+from database import get_db
+from models import Tag, blog_tags
+from schemas import TagWithCount
+from cache import response_cache, json_entry
+
+router = APIRouter(
+    prefix="/tags",
+    tags=["tags"]
+)
+
+@router.get("/", response_model=List[TagWithCount])
+async def get_tags(request: Request, db: AsyncSession = Depends(get_db)):
+    # Counts are cached until a post is created or deleted (cache tag "tags")
+    async def build():
+        post_count = func.count(blog_tags.c.blog_id)
+        result = await db.execute(
+            select(Tag.id, Tag.name, post_count.label("post_count"))
+            .outerjoin(blog_tags, blog_tags.c.tag_id == Tag.id)
+            .group_by(Tag.id, Tag.name)
+            .order_by(post_count.desc(), Tag.name)
+        )
+        return json_entry(List[TagWithCount], result.mappings().all(), fast=True)
+
+    return await response_cache.serve(request, build, tags=["tags"])
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Mapping, Union, get_args, get_origin
 from datetime import datetime
+from functools import lru_cache, partial
 
 # User Schemas
 class UserBase(BaseModel):
@@ -17,6 +18,14 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+# Shown next to comments; never includes email
+class PublicUser(BaseModel):
+    id: int
+    username: str
+
+    class Config:
+        from_attributes = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -32,22 +41,54 @@ class Tag(TagBase):
     class Config:
         from_attributes = True
 
+class TagWithCount(Tag):
+    post_count: int
+
+class OutlineEntry(BaseModel):
+    level: int
+    text: str
+    anchor: str
+
+# Resized WebP/AVIF copies of an uploaded image; srcset is keyed by MIME type
+class ResponsiveImage(BaseModel):
+    width: int
+    height: int
+    placeholder: str # Tiny inline data: URL to show while loading
+    srcset: Dict[str, str] = {}
+
 # Comment Schemas
 class CommentBase(BaseModel):
     content: str
 
 class CommentCreate(CommentBase):
-    pass
+    parent_id: Optional[int] = None # Set to reply to another comment on the same post
 
 class Comment(CommentBase):
     id: int
     created_at: datetime
     user_id: int
-    user: User # To show who commented
+    parent_id: Optional[int] = None
+    user: PublicUser # To show who commented
     
     class Config:
         from_attributes = True
 
+# Comment in a paginated thread; its author is in CommentPage.users
+class ThreadComment(CommentBase):
+    id: int
+    created_at: datetime
+    user_id: int
+    parent_id: Optional[int] = None
+    reply_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class CommentPage(BaseModel):
+    items: List[ThreadComment]
+    users: Dict[int, PublicUser] # Keyed by user id, one entry per distinct author
+    next_cursor: Optional[str] = None
+
 # Blog Schemas
 class BlogPostBase(BaseModel):
     title: str
@@ -64,14 +105,48 @@ class BlogPost(BlogPostBase):
     owner_id: int
     claps: int # Keeping for backward compatibility or total count
     reading_time: int
+    word_count: int = 0
+    excerpt: Optional[str] = None
+    image_variants: Optional[ResponsiveImage] = None
     tags: List[Tag] = []
-    comments: List[Comment] = []
+    # Newest few top-level comments; the full thread is at /blog/{id}/comments
+    comments: List[Comment] = Field([], validation_alias="latest_comments")
     likes_count: int = 0
+    comments_count: int = 0
     is_liked: bool = False # For current user context
     
     class Config:
         from_attributes = True
 
+# A single post: the list fields plus its outline and rendered HTML
+class BlogPostDetail(BlogPost):
+    outline: Optional[List[OutlineEntry]] = None # None until the post has been analyzed
+    content_html: Optional[str] = None # Sanitized, pre-rendered content
+    toc_html: Optional[str] = None
+
+# Slim list view: no content, comments or like rows
+class BlogPostSummary(BaseModel):
+    id: int
+    title: str
+    subtitle: Optional[str] = None
+    image_url: Optional[str] = None
+    image_variants: Optional[ResponsiveImage] = None
+    created_at: datetime
+    claps: int
+    reading_time: int
+    word_count: int = 0
+    excerpt: Optional[str] = None
+    tags: List[Tag] = []
+    likes_count: int = 0
+    comments_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class BlogPostSummaryPage(BaseModel):
+    items: List[BlogPostSummary]
+    next_cursor: Optional[str] = None
+
 # Project Schemas
 class ProjectBase(BaseModel):
     title: str
@@ -87,9 +162,118 @@ class Project(ProjectBase):
     id: int
     created_at: datetime
     owner_id: int
-    comments: List[Comment] = []
+    image_variants: Optional[ResponsiveImage] = None
+    comments: List[Comment] = Field([], validation_alias="latest_comments")
     likes_count: int = 0
+    comments_count: int = 0
     is_liked: bool = False
     
     class Config:
         orm_mode = True
+
+class ProjectSummary(BaseModel):
+    id: int
+    title: str
+    description: str
+    image_url: Optional[str] = None
+    image_variants: Optional[ResponsiveImage] = None
+    project_url: Optional[str] = None
+    github_url: Optional[str] = None
+    created_at: datetime
+    likes_count: int = 0
+    comments_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class ProjectSummaryPage(BaseModel):
+    items: List[ProjectSummary]
+    next_cursor: Optional[str] = None
+
+# Search Schemas
+class SearchHit(BaseModel):
+    kind: str # "blog" or "project"
+    id: int
+    title: str
+    snippet: str # HTML-escaped matching excerpt with <mark> highlights
+    score: float
+    created_at: datetime
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+
+# --- Precompiled serializers ---
+# json_entry(..., fast=True) builds response bodies without validating the
+# rows first: each schema compiles once into a function that reads the fields
+# it declares from an ORM object or a mapping and returns plain dicts and
+# lists for orjson. The JSON matches model_dump_json for the same rows, and
+# routes keep these schemas as response_model, so the OpenAPI docs still
+# describe what is sent.
+
+_MISSING = object()
+
+
+def _identity(value):
+    return value
+
+
+def _converter(annotation):
+    """Function turning a value of `annotation` into JSON-ready data."""
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is Union:
+        options = [arg for arg in args if arg is not type(None)]
+        inner = _converter(options[0]) if len(options) == 1 else _identity
+        if inner is _identity:
+            return _identity
+        return lambda value: None if value is None else inner(value)
+    if origin is list:
+        item = _converter(args[0])
+        if item is _identity:
+            return list
+        return lambda value: [item(v) for v in value]
+    if origin is dict:
+        item = _converter(args[1])
+        return lambda value: {key: item(v) for key, v in value.items()}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return serializer(annotation)
+    if annotation is float:
+        return float
+    if annotation is datetime:
+        # Raw SQL on SQLite returns timestamps as text
+        return lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+    return _identity
+
+
+@lru_cache(maxsize=None)
+def serializer(schema):
+    """Compiled serializer for a schema class or a typing form such as List[BlogPost]."""
+    if get_origin(schema) is not None:
+        return _converter(schema)
+
+    fields = []
+    for name, info in schema.model_fields.items():
+        source = info.validation_alias if isinstance(info.validation_alias, str) else name
+        default = _MISSING if info.is_required() else info.get_default(call_default_factory=True)
+        fields.append((name, source, default, _converter(info.annotation)))
+
+    def serialize(obj):
+        if isinstance(obj, Mapping):
+            get = obj.get
+            loaded = {}
+        else:
+            get = partial(getattr, obj)
+            # Loaded ORM attributes live in the instance dict; reading them
+            # there skips the instrumented descriptors
+            loaded = getattr(obj, "__dict__", {})
+        data = {}
+        for name, source, default, convert in fields:
+            value = loaded[source] if source in loaded else get(source, default)
+            if value is _MISSING:
+                raise ValueError(f"{schema.__name__}.{name} is missing")
+            data[name] = convert(value)
+        return data
+
+    return serialize
@@ -0,0 +1,190 @@
+import html
+import re
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import load_only, selectinload
+
+import models
+from database import engine, dialect_insert
+from pagination import encode_token, decode_token
+
+# Full-text search over blog posts and projects. Each searchable row has one
+# search_documents row (title + body), kept current by index_blog/index_project
+# and remove_document inside the writing transaction. PostgreSQL ranks a
+# generated tsvector column through a GIN index; SQLite (tests, local runs)
+# uses an FTS5 table synced by triggers.
+
+MAX_QUERY_TERMS = 8
+
+# Snippets are built with control characters around matches, HTML-escaped,
+# and only then get <mark> tags, so text from a post can never become markup
+_START, _STOP = "\x02", "\x03"
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_vector ON search_documents USING GIN (search_vector)",
+]
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title, body, content='search_documents', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+_POSTGRES_SEARCH = """
+SELECT d.kind, d.ref_id, d.title, d.created_at, d.id, ranked.score,
+       ts_headline('english', d.body, to_tsquery('english', :q),
+                   :headline_options) AS snippet
+FROM (
+    SELECT id, score FROM (
+        SELECT id, ts_rank_cd(search_vector, to_tsquery('english', :q))::float8 AS score
+        FROM search_documents
+        WHERE search_vector @@ to_tsquery('english', :q)
+    ) matches
+    {keyset}
+    ORDER BY score DESC, id DESC
+    LIMIT :limit
+) ranked
+JOIN search_documents d ON d.id = ranked.id
+ORDER BY ranked.score DESC, d.id DESC
+"""
+
+_SQLITE_SEARCH = """
+SELECT kind, ref_id, title, created_at, id, score, snippet FROM (
+    SELECT d.kind, d.ref_id, d.title, d.created_at, d.id,
+           -bm25(search_fts, 10.0, 1.0) AS score,
+           snippet(search_fts, 1, :start, :stop, '…', 24) AS snippet
+    FROM search_fts JOIN search_documents d ON d.id = search_fts.rowid
+    WHERE search_fts MATCH :q
+)
+{keyset}
+ORDER BY score DESC, id DESC
+LIMIT :limit
+"""
+
+
+async def ensure_search_index(conn):
+    """Create the dialect-specific index structures; safe to run on every start."""
+    ddl = _POSTGRES_DDL if conn.dialect.name == "postgresql" else _SQLITE_DDL
+    for statement in ddl:
+        await conn.execute(text(statement))
+
+
+def _snippet(raw: Optional[str]) -> Optional[str]:
+    if raw is None:
+        return None
+    return html.escape(raw).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _terms(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())[:MAX_QUERY_TERMS]
+
+
+async def _upsert(db, kind: str, ref_id: int, title: str, body: str, created_at):
+    stmt = dialect_insert(models.SearchDocument).values(
+        kind=kind, ref_id=ref_id, title=title, body=body, created_at=created_at
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["kind", "ref_id"],
+        set_={"title": stmt.excluded.title, "body": stmt.excluded.body, "created_at": stmt.excluded.created_at},
+    ))
+
+
+async def index_blog(db, blog: models.BlogPost, tag_names: List[str]):
+    body = "\n".join(part for part in (blog.subtitle, " ".join(tag_names), blog.content) if part)
+    await _upsert(db, "blog", blog.id, blog.title, body, blog.created_at)
+
+
+async def index_project(db, project: models.Project):
+    await _upsert(db, "project", project.id, project.title, project.description, project.created_at)
+
+
+async def remove_document(db, kind: str, ref_id: int):
+    await db.execute(delete(models.SearchDocument).where(
+        models.SearchDocument.kind == kind, models.SearchDocument.ref_id == ref_id
+    ))
+
+
+async def search(db, q: str, limit: int, cursor: Optional[str] = None) -> dict:
+    terms = _terms(q)
+    if not terms:
+        return {"items": [], "next_cursor": None}
+
+    if engine.dialect.name == "postgresql":
+        sql, query = _POSTGRES_SEARCH, " & ".join(f"{term}:*" for term in terms)
+    else:
+        sql, query = _SQLITE_SEARCH, " ".join(f'"{term}"*' for term in terms)
+
+    params = {
+        "q": query,
+        "limit": limit + 1,
+        "start": _START,
+        "stop": _STOP,
+        "headline_options": f'MaxFragments=2, MaxWords=30, MinWords=10, StartSel="{_START}", StopSel="{_STOP}"',
+    }
+    keyset = ""
+    if cursor:
+        try:
+            after_score, after_id = decode_token(cursor)
+            params.update(after_score=float(after_score), after_id=int(after_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        keyset = "WHERE score < :after_score OR (score = :after_score AND id < :after_id)"
+
+    result = await db.execute(text(sql.format(keyset=keyset)), params)
+    rows = result.mappings().all()
+    items = [
+        {"kind": row["kind"], "id": row["ref_id"], "title": row["title"], "snippet": _snippet(row["snippet"]),
+         "score": row["score"], "created_at": row["created_at"]}
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_token([last["score"], last["id"]])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def reindex_all(db):
+    """Rebuild search_documents from scratch, e.g. for databases created before search existed."""
+    await db.execute(delete(models.SearchDocument))
+    # Load only indexed columns: migrations call this before later columns exist
+    BlogPost, Project = models.BlogPost, models.Project
+    result = await db.execute(select(BlogPost).options(
+        load_only(BlogPost.id, BlogPost.title, BlogPost.subtitle, BlogPost.content, BlogPost.created_at),
+        selectinload(BlogPost.tags)
+    ))
+    for blog in result.scalars():
+        await index_blog(db, blog, list(dict.fromkeys(tag.name for tag in blog.tags)))
+    result = await db.execute(select(Project).options(
+        load_only(Project.id, Project.title, Project.description, Project.created_at)
+    ))
+    for project in result.scalars():
+        await index_project(db, project)
+
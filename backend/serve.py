@@ -0,0 +1,77 @@
+"""Production server: migrations once, then N uvicorn workers.
+
+    python serve.py [--workers N] [--host HOST] [--port PORT] [--skip-migrations]
+
+Migrations run here, before any worker starts, so workers only check that
+the schema is current instead of each repeating the DDL. Workers use uvloop
+and httptools when installed, warm their connection pool and response
+cache before accepting connections, report on /health/live and
+/health/ready, and drain on SIGTERM (see lifecycle.py).
+
+The response cache, rate limits, like cache and clap buffer live in each
+worker by default, so WEB_CONCURRENCY defaults to 1 unless CACHE_BACKEND
+and RATE_LIMIT_BACKEND are both redis; then it defaults to the CPU count.
+With several workers, also set EVENTS_BROKER=postgres so live events reach
+clients on any worker (docker-compose's backend-prod sets all three).
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+
+SHARED_BACKENDS = all(os.getenv(name, "memory") == "redis" for name in ("CACHE_BACKEND", "RATE_LIMIT_BACKEND"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1) if SHARED_BACKENDS else "1"))
+# Time allowed for in-flight requests once the worker stops accepting connections
+SHUTDOWN_TIMEOUT_SECONDS = int(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "25"))
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Run the API with multiple workers")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--skip-migrations", action="store_true", help="schema is managed elsewhere")
+    args = parser.parse_args(argv)
+
+    if not args.skip_migrations:
+        import migrate
+        status = asyncio.run(migrate.main([]))
+        if status:
+            return status
+    # Inherited by the workers
+    os.environ["RUN_MIGRATIONS"] = "false"
+
+    if args.workers > 1:
+        if os.getenv("CACHE_BACKEND", "memory") == "memory":
+            print("Warning: CACHE_BACKEND=memory with several workers; pages may be stale for up to "
+                  "CACHE_TTL_SECONDS after a write handled by another worker", file=sys.stderr)
+        if os.getenv("RATE_LIMIT_BACKEND", "memory") == "memory":
+            print("Warning: RATE_LIMIT_BACKEND=memory with several workers; each worker allows "
+                  "the full rate limit", file=sys.stderr)
+        if os.getenv("EVENTS_BROKER", "local") == "local":
+            print("Warning: EVENTS_BROKER=local with several workers; live events only reach clients "
+                  "connected to the worker that handled the write", file=sys.stderr)
+
+    import uvicorn
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        timeout_graceful_shutdown=SHUTDOWN_TIMEOUT_SECONDS,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
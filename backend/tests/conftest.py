@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+# Modules read their configuration at import time; point them at a scratch database
+_workdir = tempfile.mkdtemp(prefix="portfolio-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_workdir}/test.db")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_workdir, "uploads"))
+# Limits are exercised on purpose in test_ratelimit; elsewhere they would only get in the way
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The whole app with its startup and shutdown, on the scratch database."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    client.post("/auth/register", json={"username": "admin", "email": "admin@example.com", "password": "secret"})
+    response = client.post("/auth/login", data={"username": "admin", "password": "secret"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
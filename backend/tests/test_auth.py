@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import delete, update
+
+import auth
+import models
+from database import Base, SessionLocal, engine
+from events import event_hub
+
+app = FastAPI()
+
+
+@app.get("/me")
+async def me(user=Depends(auth.get_current_user)):
+    return user.model_dump()
+
+
+@app.get("/admin")
+async def admin(user=Depends(auth.get_current_admin_user)):
+    return {"ok": True}
+
+
+
+
+async def _with_user(user_id: int, check):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    claims = {"sub": f"user{user_id}", "uid": user_id, "email": f"old{user_id}@x", "is_admin": True}
+    async with SessionLocal() as db:
+        db.add(models.User(id=user_id, username=claims["sub"], email=claims["email"], is_admin=True))
+        await db.commit()
+    token = auth.create_access_token(claims)
+    await event_hub.start()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            client.headers["Authorization"] = f"Bearer {token}"
+            await check(client)
+    finally:
+        await event_hub.stop()
+        await engine.dispose()
+
+
+async def _change(user_id: int, statement):
+    async with SessionLocal() as db:
+        await db.execute(statement.where(models.User.id == user_id))
+        await db.commit()
+
+
+def test_demoted_admin_loses_admin_routes_with_a_cached_token():
+    async def check(client):
+        assert (await client.get("/admin")).status_code == 200
+        await _change(201, update(models.User).values(is_admin=False))
+        # Same token, still cached with is_admin true
+        assert (await client.get("/me")).json()["is_admin"] is True
+        assert (await client.get("/admin")).status_code == 403
+
+    asyncio.run(_with_user(201, check))
+
+
+def test_deleted_admin_loses_admin_routes():
+    async def check(client):
+        assert (await client.get("/admin")).status_code == 200
+        await _change(202, delete(models.User))
+        assert (await client.get("/admin")).status_code == 403
+
+    asyncio.run(_with_user(202, check))
+
+
+def test_invalidate_user_rereads_the_user_on_every_worker():
+    async def check(client):
+        assert (await client.get("/me")).json()["email"] == "old203@x"
+        await _change(203, update(models.User).values(email="new203@x", is_admin=False))
+        auth.invalidate_user(203)
+        me = (await client.get("/me")).json()
+        assert me["email"] == "new203@x" and me["is_admin"] is False
+
+        # A notice from another worker drops this worker's cached session too
+        auth._cache_user("other-token", auth.UserSnapshot(id=203, username="user203", email="x", is_admin=True), 2e9)
+        event_hub.publish(auth.USERS_TOPIC, {"203": 4e9})
+        await asyncio.sleep(0.6)
+        assert auth._cached_user("other-token") is None
+
+    asyncio.run(_with_user(203, check))
+
+
+OPERATIONAL_PATHS = ["/metrics", "/cache/stats", "/db/stats", "/auth/stats"]
+
+
+def test_operational_endpoints_need_an_admin_or_the_metrics_token(client, admin_headers, monkeypatch):
+    client.post("/auth/register", json={"username": "reader", "email": "reader@example.com", "password": "secret"})
+    login = client.post("/auth/login", data={"username": "reader", "password": "secret"})
+    reader_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    monkeypatch.setattr(auth, "METRICS_TOKEN", "scrape-me")
+
+    for path in OPERATIONAL_PATHS:
+        assert client.get(path).status_code == 401, path
+        assert client.get(path, headers=reader_headers).status_code == 403, path
+        assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401, path
+        assert client.get(path, headers=admin_headers).status_code == 200, path
+        assert client.get(path, headers={"Authorization": "Bearer scrape-me"}).status_code == 200, path
@@ -0,0 +1,29 @@
+def create_post(client, headers, **fields) -> dict:
+    data = {"title": "Post", "content": "# Heading\n\nSome text.", **fields}
+    response = client.post("/blog/", data=data, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_rendered_html_only_in_single_post_responses(client, admin_headers):
+    post = create_post(client, admin_headers, title="Rendered")
+    assert post["content_html"] and post["outline"]
+
+    detail = client.get(f"/blog/{post['id']}").json()
+    assert "Heading</h2>" in detail["content_html"] and detail["outline"][0]["text"] == "Heading"
+
+    listed = next(item for item in client.get("/blog/").json() if item["id"] == post["id"])
+    assert listed["content"] == post["content"]
+    for field in ("content_html", "toc_html", "outline"):
+        assert field not in listed
+
+
+def test_new_posts_and_projects_are_in_ranked_lists_at_once(client, admin_headers):
+    post = create_post(client, admin_headers, title="Fresh")
+    project = client.post("/projects/", data={"title": "Fresh", "description": "New."}, headers=admin_headers).json()
+
+    for sort in ("trending", "popular"):
+        listed = client.get("/blog/", params={"sort": sort, "limit": 100}).json()
+        assert post["id"] in [item["id"] for item in listed], sort
+        listed = client.get("/projects/", params={"sort": sort, "limit": 100}).json()
+        assert project["id"] in [item["id"] for item in listed], sort
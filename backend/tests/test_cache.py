@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi import FastAPI, Query, Request
+from fastapi.testclient import TestClient
+
+from cache import MemoryBackend, ResponseCache, json_entry
+
+
+def entry(body: str):
+    return json_entry(str, body)
+
+
+def test_entry_built_across_an_invalidation_is_not_stored():
+    cache = ResponseCache(MemoryBackend())
+    app = FastAPI()
+    builds = []
+
+    @app.get("/posts")
+    async def posts(request: Request):
+        async def build():
+            builds.append(1)
+            if len(builds) == 1:
+                # A write lands while the first body is being built
+                await cache.invalidate("blog:list")
+            return entry(f"v{len(builds)}")
+
+        return await cache.serve(request, build, tags=["blog:list"])
+
+    client = TestClient(app)
+    assert client.get("/posts").json() == "v1"
+    assert client.get("/posts").json() == "v2"
+    assert client.get("/posts").json() == "v2"
+    assert len(builds) == 2
+    assert cache.stats()["discarded"] == 1
+
+
+def test_key_ignores_undeclared_query_params():
+    cache = ResponseCache(MemoryBackend())
+    app = FastAPI()
+
+    @app.get("/posts")
+    async def posts(request: Request, limit: int = 10, sort: str = Query("recent", alias="order")):
+        async def build():
+            return entry(f"{limit}:{sort}")
+
+        return await cache.serve(request, build, tags=["blog:list"])
+
+    client = TestClient(app)
+    for junk in range(20):
+        assert client.get(f"/posts?limit=5&junk={junk}").json() == "5:recent"
+    assert client.get("/posts?order=popular&limit=5&x=1").json() == "5:popular"
+    assert sorted(cache.backend.entries) == ["/posts?limit=5", "/posts?limit=5&order=popular"]
+
+
+def test_tag_sets_are_pruned_on_eviction():
+    async def run():
+        backend = MemoryBackend(max_bytes=40)
+        for n in range(50):
+            await backend.set(f"/blog/{n}", entry(f"post {n}"), [f"blog:{n}", "blog:list"], 60)
+        assert set(backend.tags["blog:list"]) == set(backend.entries)
+        assert set(backend.tags) == {"blog:list"} | {f"blog:{key.rsplit('/', 1)[1]}" for key in backend.entries}
+        await backend.invalidate(["blog:list"])
+        assert backend.tags == {} and backend.key_tags == {} and backend.size == 0
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import asyncio
+
+from sqlalchemy import event, select
+
+import claps
+import models
+from cache import MemoryBackend, ResponseCache, json_entry
+from claps import ClapBuffer
+from database import Base, SessionLocal, engine
+
+
+def test_buffered_claps_are_flushed_in_id_order_and_invalidate_the_pages(monkeypatch):
+    cache = ResponseCache(MemoryBackend())
+    monkeypatch.setattr(claps, "response_cache", cache)
+    updated = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE blog_posts"):
+            updated.append(parameters[-1])
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with SessionLocal() as db:
+            posts = [models.BlogPost(title=f"clap {n}", content="x", claps=5) for n in range(3)]
+            db.add_all(posts)
+            await db.flush()
+            ids = [post.id for post in posts]
+            await db.commit()
+        for blog_id in ids:
+            await cache.backend.set(f"/blog/{blog_id}", json_entry(str, "page"), [f"blog:{blog_id}"], 60)
+        await cache.backend.set("/blog/?", json_entry(str, "list"), ["blog:list"], 60)
+
+        buffer = ClapBuffer(interval=3600, threshold=1000)
+        for blog_id in reversed(ids):
+            buffer.remember(blog_id, 5)
+            assert buffer.add(blog_id, 2) == 7
+        assert buffer.add(ids[0]) == 8
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            await buffer.flush()
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+        async with SessionLocal() as db:
+            result = await db.execute(select(models.BlogPost.id, models.BlogPost.claps).where(models.BlogPost.id.in_(ids)))
+            stored = dict(result.all())
+        await engine.dispose()
+        return ids, stored, buffer
+
+    ids, stored, buffer = asyncio.run(run())
+    assert stored == {ids[0]: 8, ids[1]: 7, ids[2]: 7}
+    assert updated == sorted(ids)
+    assert buffer.pending == {} and buffer.estimate(ids[0], 0) == 8
+    assert cache.backend.entries == {}
@@ -0,0 +1,29 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import compression
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return compression.brotli.decompress(body)
+    if encoding == "zstd":
+        return compression.zstandard.ZstdDecompressor().decompress(body)
+    return gzip.decompress(body)
+
+
+@pytest.mark.parametrize("encoding", compression.ENCODINGS)
+@pytest.mark.parametrize("stored", [False, True])
+def test_concurrent_compression_round_trips(encoding, stored):
+    # Distinct bodies, large enough that compress_async would offload them to threads
+    bodies = [
+        json.dumps([{"id": i, "n": n, "text": f"post {i} " * 50} for n in range(200)]).encode()
+        for i in range(64)
+    ]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outputs = list(pool.map(lambda body: compression.compress(body, encoding, stored), bodies * 4))
+    for body, output in zip(bodies * 4, outputs):
+        assert decompress(output, encoding) == body
@@ -0,0 +1,30 @@
+import asyncio
+import os
+
+from events import EventHub, LocalBroker
+from likes import LIKES_TOPIC, LikeCache
+
+
+def test_like_toggles_on_other_workers_drop_cached_likes():
+    async def run():
+        hub = EventHub(LocalBroker(), max_rate=1000)
+        await hub.start()
+        cache = LikeCache()
+        hub.listen(LIKES_TOPIC, cache.on_event)
+        cache.known("blog", 7)[42] = False
+        cache.known("blog", 8)[42] = True
+
+        # Another worker's toggle for user 7
+        hub.publish(LIKES_TOPIC, {"blog:7": os.getpid() + 1})
+        # This worker's own notice comes back too; its write-through already applied it
+        hub.publish(LIKES_TOPIC, {"blog:8": os.getpid()})
+        await asyncio.sleep(0.05)
+        assert ("blog", 7) not in cache.entries
+        assert cache.entries[("blog", 8)][1] == {42: True}
+
+        hub.publish(LIKES_TOPIC, {"resync": True})
+        await asyncio.sleep(0.05)
+        assert cache.entries == {}
+        await hub.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,78 @@
+import asyncio
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import migrate
+import models
+
+
+def test_counters_are_added_and_backfilled_on_a_database_created_before_them(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/legacy.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+            # The schema as it was before the counters: no likes_count/comments_count/image_variants
+            for table in ("blog_posts", "projects"):
+                for column in ("likes_count", "comments_count", "image_variants"):
+                    await conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+            await conn.execute(text("INSERT INTO users (id, username, email) VALUES (1, 'a', 'a@x'), (2, 'b', 'b@x')"))
+            await conn.execute(text("INSERT INTO blog_posts (id, title, content, owner_id) VALUES (1, 't', 'c', 1), (2, 'u', 'c', 1)"))
+            await conn.execute(text("INSERT INTO blog_likes (blog_id, user_id) VALUES (1, 1), (1, 2)"))
+            await conn.execute(text("INSERT INTO blog_comments (blog_id, user_id, content) VALUES (1, 1, 'x')"))
+            await conn.execute(text("INSERT INTO projects (id, title, description, owner_id) VALUES (1, 'p', 'd', 1)"))
+            await conn.execute(text("INSERT INTO project_likes (project_id, user_id) VALUES (1, 2)"))
+            await conn.execute(text("INSERT INTO project_comments (project_id, user_id, content) VALUES (1, 1, 'x'), (1, 2, 'y')"))
+
+        await migrate.run_migrations(engine)
+
+        async with engine.connect() as conn:
+            blogs = (await conn.execute(text("SELECT id, likes_count, comments_count FROM blog_posts ORDER BY id"))).all()
+            projects = (await conn.execute(text("SELECT id, likes_count, comments_count FROM projects"))).all()
+        await engine.dispose()
+        assert [tuple(row) for row in blogs] == [(1, 2, 1), (2, 0, 0)]
+        assert [tuple(row) for row in projects] == [(1, 1, 2)]
+
+    asyncio.run(run())
+
+
+def _schema(sync_conn, tables) -> dict:
+    inspector = inspect(sync_conn)
+    return {
+        table: {
+            "columns": sorted(column["name"] for column in inspector.get_columns(table)),
+            "primary_key": sorted(inspector.get_pk_constraint(table)["constrained_columns"]),
+            "indexes": sorted(index["name"] for index in inspector.get_indexes(table)),
+            "foreign_keys": sorted(fk["referred_table"] for fk in inspector.get_foreign_keys(table)),
+        }
+        for table in tables
+    }
+
+
+def test_fresh_database_from_migrations_matches_the_models(tmp_path):
+    async def run():
+        tables = sorted(models.Base.metadata.tables)
+        migrated = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/migrated.db")
+        await migrate.run_migrations(migrated)
+        declared = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/declared.db")
+        async with declared.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        schemas = []
+        for engine in (migrated, declared):
+            async with engine.connect() as conn:
+                schemas.append(await conn.run_sync(_schema, tables))
+            await engine.dispose()
+        assert schemas[0] == schemas[1]
+
+    asyncio.run(run())
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/plans.db")
+        await migrate.run_migrations(engine)
+        failures = await migrate.check_plans(engine)
+        await engine.dispose()
+        assert failures == []
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+
+import pytest
+
+from pagination import encode_token
+
+TAG = "pagingtest"
+POSTS = 7
+
+
+def database_path() -> str:
+    return os.environ["DATABASE_URL"].split(":///", 1)[1]
+
+
+@pytest.fixture(scope="module")
+def tied_posts(client, admin_headers):
+    ids = []
+    for n in range(POSTS):
+        response = client.post("/blog/", data={"title": f"Tied {n}", "content": "x", "tags": TAG}, headers=admin_headers)
+        ids.append(response.json()["id"])
+    # Same created_at for all but one, so pages break inside a tie
+    with sqlite3.connect(database_path()) as conn:
+        conn.execute(
+            f"UPDATE blog_posts SET created_at = '2025-01-01 12:00:00.000000' WHERE id IN ({','.join('?' * len(ids))})", ids
+        )
+        conn.execute("UPDATE blog_posts SET created_at = '2025-01-02 12:00:00.000000' WHERE id = ?", (ids[0],))
+    # Newest first, then id descending within the tie
+    return [ids[0]] + sorted(ids[1:], reverse=True)
+
+
+def test_full_view_pages_through_ties_via_header(client, tied_posts):
+    seen, cursor = [], None
+    while True:
+        params = {"tag": TAG, "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/blog/", params=params)
+        assert response.status_code == 200
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == tied_posts
+
+
+def test_summary_view_pages_through_ties_in_body(client, tied_posts):
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"tag": TAG, "limit": 2, "view": "summary", **({"cursor": cursor} if cursor else {})}
+        page = client.get("/blog/", params=params).json()
+        assert "content" not in page["items"][0]
+        seen += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == tied_posts
+    assert pages == 4
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    encode_token({"created_at": 1}),
+    encode_token(["yesterday", 1]),
+    encode_token(["2025-01-01T00:00:00", "one"]),
+    encode_token([None, 1]),
+    encode_token([1]),
+])
+def test_malformed_cursor_is_a_400(client, cursor):
+    for view in ("full", "summary"):
+        response = client.get("/blog/", params={"cursor": cursor, "view": view})
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid cursor"}
@@ -0,0 +1,51 @@
+import pytest
+
+import ratelimit
+from database import get_db
+from ratelimit import Limit, MemoryBackend, rate_limiter
+
+
+@pytest.fixture
+def sessions(client, monkeypatch):
+    """Turns the limiter on with fresh buckets and counts database sessions handed to routes."""
+    opened = []
+
+    async def counting_get_db():
+        opened.append(1)
+        async for session in get_db():
+            yield session
+
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "backend", MemoryBackend())
+    client.app.dependency_overrides[get_db] = counting_get_db
+    yield opened
+    client.app.dependency_overrides.pop(get_db, None)
+
+
+def test_clap_limit_refuses_before_opening_a_session(client, admin_headers, sessions, monkeypatch):
+    monkeypatch.setitem(ratelimit.LIMITS, "clap", Limit(2, 600))
+    post = client.post("/blog/", data={"title": "Limited", "content": "x"}, headers=admin_headers).json()
+    sessions.clear()
+
+    for _ in range(2):
+        assert client.post(f"/blog/{post['id']}/clap").status_code == 200
+    assert len(sessions) == 2
+
+    response = client.post(f"/blog/{post['id']}/clap")
+    assert response.status_code == 429
+    # One token refills every 300s
+    assert 290 <= int(response.headers["Retry-After"]) <= 300
+    assert len(sessions) == 2
+    assert rate_limiter.rejected["clap"] >= 1
+
+
+def test_login_limit_refuses_before_the_password_check(client, sessions, monkeypatch):
+    monkeypatch.setitem(ratelimit.LIMITS, "login", Limit(1, 60))
+    form = {"username": "nobody", "password": "wrong"}
+    assert client.post("/auth/login", data=form).status_code == 401
+    assert len(sessions) == 1
+
+    response = client.post("/auth/login", data=form)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert len(sessions) == 1
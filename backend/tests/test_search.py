@@ -0,0 +1,24 @@
+import asyncio
+from datetime import datetime
+
+import models
+import search
+from database import Base, SessionLocal, engine
+
+
+async def _search_for_script():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await search.ensure_search_index(conn)
+    async with SessionLocal() as db:
+        post = models.BlogPost(id=1, title="Injected", content="hello <script>alert(1)</script> world", created_at=datetime.utcnow())
+        await search.index_blog(db, post, [])
+        await db.commit()
+        return await search.search(db, "alert", limit=10)
+
+
+def test_snippet_escapes_post_text():
+    page = asyncio.run(_search_for_script())
+    snippet = page["items"][0]["snippet"]
+    assert "<script>" not in snippet
+    assert "&lt;script&gt;<mark>alert</mark>(1)&lt;/script&gt;" in snippet
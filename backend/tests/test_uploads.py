@@ -0,0 +1,70 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from uploads import UploadLimitMiddleware, UploadStaticFiles
+
+LIMIT = 1000
+
+app = FastAPI()
+app.add_middleware(UploadLimitMiddleware, max_bytes=LIMIT)
+parsed = []
+
+
+@app.post("/upload")
+async def upload(image: UploadFile = File(...)):
+    parsed.append(image.filename)
+    return {"size": len(await image.read())}
+
+
+client = TestClient(app)
+
+
+def multipart(size: int):
+    boundary = "bound"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"a.png\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + b"x" * size + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def test_small_upload_passes():
+    body, headers = multipart(100)
+    response = client.post("/upload", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_declared_length_over_limit_is_refused_before_parsing():
+    parsed.clear()
+    body, headers = multipart(LIMIT * 2)
+    response = client.post("/upload", content=body, headers=headers)
+    assert response.status_code == 413
+    assert parsed == []
+
+
+def test_undeclared_length_is_counted_while_reading():
+    parsed.clear()
+    body, headers = multipart(LIMIT * 2)
+
+    def chunks():
+        for start in range(0, len(body), 256):
+            yield body[start:start + 256]
+
+    response = client.post("/upload", content=chunks(), headers=headers)
+    assert response.status_code == 413
+    assert parsed == []
+
+
+def test_uploads_are_served_immutable_and_as_stored(tmp_path):
+    (tmp_path / "abc.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"x" * 100)
+    static = FastAPI()
+    static.mount("/uploads", UploadStaticFiles(directory=tmp_path))
+    files = TestClient(static)
+
+    response = files.get("/uploads/abc.png", headers={"Accept-Encoding": "gzip, br"})
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["etag"] == '"abc.png"' and "content-encoding" not in response.headers
+    assert files.get("/uploads/abc.png", headers={"If-None-Match": '"abc.png"'}).status_code == 304
+    assert files.get("/uploads/abc.png", headers={"Range": "bytes=0-7"}).status_code == 206
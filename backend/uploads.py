@@ -0,0 +1,161 @@
+import hashlib
+import os
+import tempfile
+from mimetypes import guess_type
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, JSONResponse
+from starlette.staticfiles import NotModifiedResponse
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+# Origin that serves /uploads, used to build image URLs stored on posts and projects
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+UPLOAD_CACHE_MAX_AGE = int(os.getenv("UPLOAD_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# Whole multipart request: the image plus the other form fields (post content etc.)
+UPLOAD_REQUEST_MAX_BYTES = int(os.getenv("UPLOAD_REQUEST_MAX_BYTES", str(UPLOAD_MAX_BYTES + 2 * 1024 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+
+# (offset, signature, extension); the client's filename and content type are ignored
+_SIGNATURES = [
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (8, b"WEBP", "webp"),
+    (4, b"ftypavif", "avif"),
+]
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    for offset, signature, extension in _SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if extension == "webp" and not head.startswith(b"RIFF"):
+                continue
+            return extension
+    return None
+
+
+class UploadLimitMiddleware:
+    """Refuses multipart bodies over UPLOAD_REQUEST_MAX_BYTES before they are parsed.
+
+    A declared Content-Length over the cap gets 413 without reading the body;
+    otherwise bytes are counted as the form parser pulls them and the request
+    fails with 413 as soon as the count passes the cap.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_REQUEST_MAX_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/"):
+            await self.app(scope, receive, send)
+            return
+
+        length = headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": "Request is too large"}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parser; FastAPI passes HTTPException through as the response
+                    raise HTTPException(status_code=413, detail="Request is too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def save_upload(upload: UploadFile) -> str:
+    """Copy an uploaded image into UPLOAD_DIR and return its stored filename.
+
+    By the time a route sees the UploadFile, Starlette has parsed and spooled
+    the whole part; UploadLimitMiddleware is what bounds the request body.
+    Here the image itself is held to UPLOAD_MAX_BYTES and its type checked
+    from its magic bytes. Files are named by the SHA-256 of their content, so
+    re-uploading an image reuses the existing file. Data goes to a temp file
+    first and is renamed into place once complete; disk I/O runs in the
+    threadpool.
+    """
+    if upload.size is not None and upload.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+
+    fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=UPLOAD_DIR, suffix=".part")
+    out = os.fdopen(fd, "wb")
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        extension = None
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if extension is None:
+                extension = sniff_image_type(chunk)
+                if extension is None:
+                    raise HTTPException(status_code=415, detail="Unsupported image type")
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Image is too large")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+        if extension is None:
+            raise HTTPException(status_code=400, detail="Empty image upload")
+        await run_in_threadpool(out.close)
+
+        filename = f"{digest.hexdigest()}.{extension}"
+        final_path = os.path.join(UPLOAD_DIR, filename)
+        if os.path.exists(final_path):
+            await run_in_threadpool(os.remove, tmp_path)
+        else:
+            await run_in_threadpool(os.replace, tmp_path, final_path)
+        return filename
+    except BaseException:
+        out.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def upload_url(filename: str) -> str:
+    return f"{PUBLIC_BASE_URL}/uploads/{filename}"
+
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles for /uploads, where a file never changes once written.
+
+    Stored names are content hashes (or UUIDs for older uploads), so responses
+    are cacheable forever and the name itself is a strong ETag. Uploads are
+    only already-compressed image formats (see _SIGNATURES), so there are no
+    precompressed variants to pick from. Range and If-Range handling is left
+    to FileResponse.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(str(full_path))
+        headers = {
+            "Cache-Control": f"public, max-age={UPLOAD_CACHE_MAX_AGE}, immutable",
+            "ETag": f'"{name}"',
+        }
+        media_type = guess_type(name)[0]
+        response = FileResponse(full_path, status_code=status_code, headers=headers, media_type=media_type, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
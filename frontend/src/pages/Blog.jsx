@@ -3,14 +3,18 @@ import { Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import axios from 'axios';
 
+const SORTS = [['recent', 'Latest'], ['trending', 'Trending'], ['popular', 'Popular']];
+
 const Blog = () => {
     const [blogs, setBlogs] = useState([]);
+    const [sort, setSort] = useState('recent');
 
     useEffect(() => {
         const fetchBlogs = async () => {
             try {
-                const response = await axios.get(`${import.meta.env.VITE_API_URL}/blog/`);
-                setBlogs(response.data);
+                // Summary view: excerpt instead of the full content
+                const response = await axios.get(`${import.meta.env.VITE_API_URL}/blog/`, { params: { view: 'summary', sort } });
+                setBlogs(response.data.items);
             } catch (error) {
                 console.error('Error fetching blogs:', error);
                 setBlogs([
@@ -20,7 +24,7 @@ const Blog = () => {
             }
         };
         fetchBlogs();
-    }, []);
+    }, [sort]);
 
     return (
         <div className="min-h-screen pt-24 pb-12 px-4 sm:px-6 lg:px-8 bg-[var(--bg-color)] text-[var(--text-color)] transition-colors duration-300">
@@ -28,10 +32,21 @@ const Blog = () => {
                 <motion.h2
                     initial={{ opacity: 0, y: -20 }}
                     animate={{ opacity: 1, y: 0 }}
-                    className="text-5xl font-serif font-bold mb-16 text-[var(--text-color)] border-b border-[var(--border-color)] pb-4"
+                    className="text-5xl font-serif font-bold mb-6 text-[var(--text-color)] border-b border-[var(--border-color)] pb-4"
                 >
                     Stories
                 </motion.h2>
+                <div className="flex space-x-6 mb-12 text-sm">
+                    {SORTS.map(([value, label]) => (
+                        <button
+                            key={value}
+                            onClick={() => setSort(value)}
+                            className={`transition-colors ${sort === value ? 'text-[var(--text-color)] font-medium' : 'text-[var(--text-muted)] hover:text-[var(--text-color)]'}`}
+                        >
+                            {label}
+                        </button>
+                    ))}
+                </div>
                 <div className="space-y-12">
                     {blogs.map((blog, index) => (
                         <motion.div
@@ -59,7 +74,7 @@ const Blog = () => {
                                     </p>
                                 )}
                                 <p className="text-[var(--text-muted)] font-serif leading-relaxed line-clamp-2">
-                                    {blog.content}
+                                    {blog.excerpt ?? blog.content}
                                 </p>
                                 <div className="pt-4 flex items-center justify-between">
                                     <div className="flex items-center space-x-4">
@@ -12,11 +12,15 @@ const BlogDetail = () => {
     const [loading, setLoading] = useState(true);
     const [comment, setComment] = useState('');
     const [submitting, setSubmitting] = useState(false);
+    const [thread, setThread] = useState(null); // Full comment thread, loaded on demand
 
     useEffect(() => {
         const fetchBlog = async () => {
             try {
-                const response = await axios.get(`${import.meta.env.VITE_API_URL}/blog/${id}`);
+                const token = localStorage.getItem('token');
+                // Signed-in viewers get is_liked filled in
+                const headers = token ? { Authorization: `Bearer ${token}` } : {};
+                const response = await axios.get(`${import.meta.env.VITE_API_URL}/blog/${id}`, { headers });
                 setBlog(response.data);
             } catch (error) {
                 console.error('Error fetching blog:', error);
@@ -27,6 +31,22 @@ const BlogDetail = () => {
         fetchBlog();
     }, [id]);
 
+    useEffect(() => {
+        // Live counts and new comments; the server sends at most a few merged updates a second
+        const source = new EventSource(`${import.meta.env.VITE_API_URL}/blog/${id}/events`);
+        source.onmessage = (event) => {
+            const { comments = [], resync, ...counts } = JSON.parse(event.data);
+            setBlog((current) => {
+                if (!current) return current;
+                const known = new Set((current.comments || []).map((c) => c.id));
+                const fresh = comments.filter((c) => c.parent_id == null && !known.has(c.id));
+                return { ...current, ...counts, comments: [...(current.comments || []), ...fresh] };
+            });
+            if (resync) setThread(null); // Missed comments; "View all" reloads the thread
+        };
+        return () => source.close();
+    }, [id]);
+
     const handleLike = async () => {
         if (!user) {
             alert("Please login to like this post");
@@ -37,12 +57,26 @@ const BlogDetail = () => {
             const response = await axios.post(`${import.meta.env.VITE_API_URL}/blog/${id}/like`, {}, {
                 headers: { Authorization: `Bearer ${token}` }
             });
-            setBlog({ ...blog, claps: response.data.likes_count });
+            setBlog({ ...blog, claps: response.data.likes_count, is_liked: response.data.is_liked });
         } catch (error) {
             console.error('Error liking:', error);
         }
     };
 
+    const loadComments = async () => {
+        try {
+            const params = thread?.next_cursor ? { cursor: thread.next_cursor } : {};
+            const response = await axios.get(`${import.meta.env.VITE_API_URL}/blog/${id}/comments`, { params });
+            const page = response.data;
+            setThread({
+                items: [...(thread?.items || []), ...page.items.map((c) => ({ ...c, user: page.users[c.user_id] }))],
+                next_cursor: page.next_cursor
+            });
+        } catch (error) {
+            console.error('Error loading comments:', error);
+        }
+    };
+
     const handleCommentSubmit = async (e) => {
         e.preventDefault();
         if (!user) return;
@@ -58,7 +92,13 @@ const BlogDetail = () => {
 
             // Add new comment to the list
             const newComment = { ...response.data, user: { username: user.sub } }; // Optimistic update or response structure
-            setBlog({ ...blog, comments: [...(blog.comments || []), newComment] });
+            // The live stream may have delivered this comment already
+            setBlog((current) => (current.comments || []).some((c) => c.id === newComment.id) ? current : {
+                ...current, comments: [...(current.comments || []), newComment], comments_count: (current.comments_count || 0) + 1
+            });
+            if (thread && !thread.next_cursor) {
+                setThread({ ...thread, items: [...thread.items, newComment] });
+            }
             setComment('');
         } catch (error) {
             console.error('Error commenting:', error);
@@ -117,7 +157,7 @@ const BlogDetail = () => {
                                 <svg xmlns="http://www.w3.org/2000/svg" className="h-6 w-6" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                                     <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M8 12h.01M12 12h.01M16 12h.01M21 12c0 4.418-4.03 8-9 8a9.863 9.863 0 01-4.255-.949L3 20l1.395-3.72C3.512 15.042 3 13.574 3 12c0-4.418 4.03-8 9-8s9 3.582 9 8z" />
                                 </svg>
-                                <span>{blog.comments ? blog.comments.length : 0}</span>
+                                <span>{blog.comments_count || 0}</span>
                             </button>
                         </div>
                     </div>
@@ -132,11 +172,23 @@ const BlogDetail = () => {
                         </div>
                     )}
 
-                    <div className="prose prose-lg max-w-none font-serif text-[var(--text-muted)] leading-relaxed mb-12">
-                        {blog.content.split('\n').map((paragraph, index) => (
-                            <p key={index} className="mb-6">{paragraph}</p>
-                        ))}
-                    </div>
+                    {blog.toc_html && (
+                        <div className="mb-12 text-[var(--text-muted)]" dangerouslySetInnerHTML={{ __html: blog.toc_html }} />
+                    )}
+
+                    {/* content_html is rendered and sanitized by the API when the post is saved */}
+                    {blog.content_html ? (
+                        <div
+                            className="prose prose-lg max-w-none font-serif text-[var(--text-muted)] leading-relaxed mb-12"
+                            dangerouslySetInnerHTML={{ __html: blog.content_html }}
+                        />
+                    ) : (
+                        <div className="prose prose-lg max-w-none font-serif text-[var(--text-muted)] leading-relaxed mb-12">
+                            {blog.content.split('\n').map((paragraph, index) => (
+                                <p key={index} className="mb-6">{paragraph}</p>
+                            ))}
+                        </div>
+                    )}
 
                     <div className="flex flex-wrap gap-2 mb-12">
                         {blog.tags && blog.tags.map(tag => (
@@ -148,7 +200,7 @@ const BlogDetail = () => {
 
                     {/* Comments Section */}
                     <div className="border-t border-[var(--border-color)] pt-12">
-                        <h3 className="text-2xl font-bold mb-8">Comments ({blog.comments ? blog.comments.length : 0})</h3>
+                        <h3 className="text-2xl font-bold mb-8">Comments ({blog.comments_count || 0})</h3>
 
                         {user ? (
                             <form onSubmit={handleCommentSubmit} className="mb-12">
@@ -174,7 +226,7 @@ const BlogDetail = () => {
                         )}
 
                         <div className="space-y-8">
-                            {blog.comments && blog.comments.map((comment) => (
+                            {(thread ? thread.items : blog.comments || []).map((comment) => (
                                 <div key={comment.id} className="flex space-x-4">
                                     <div className="w-10 h-10 rounded-full bg-gray-700 flex items-center justify-center font-bold text-[var(--text-muted)] flex-shrink-0">
                                         {comment.user?.username?.[0]?.toUpperCase() || 'U'}
@@ -189,6 +241,13 @@ const BlogDetail = () => {
                                 </div>
                             ))}
                         </div>
+                        {(thread ? thread.next_cursor : (blog.comments_count || 0) > (blog.comments || []).length) && (
+                            <div className="mt-8 text-center">
+                                <button onClick={loadComments} className="text-primary hover:text-secondary font-medium">
+                                    {thread ? 'Load more comments' : `View all ${blog.comments_count} comments`}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 </motion.div>
             </article>
@@ -12,11 +12,15 @@ const ProjectDetail = () => {
     const [loading, setLoading] = useState(true);
     const [comment, setComment] = useState('');
     const [submitting, setSubmitting] = useState(false);
+    const [thread, setThread] = useState(null); // Full comment thread, loaded on demand
 
     useEffect(() => {
         const fetchProject = async () => {
             try {
-                const response = await axios.get(`${import.meta.env.VITE_API_URL}/projects/${id}`);
+                const token = localStorage.getItem('token');
+                // Signed-in viewers get is_liked filled in
+                const headers = token ? { Authorization: `Bearer ${token}` } : {};
+                const response = await axios.get(`${import.meta.env.VITE_API_URL}/projects/${id}`, { headers });
                 setProject(response.data);
             } catch (error) {
                 console.error('Error fetching project:', error);
@@ -27,6 +31,22 @@ const ProjectDetail = () => {
         fetchProject();
     }, [id]);
 
+    useEffect(() => {
+        // Live counts and new comments; the server sends at most a few merged updates a second
+        const source = new EventSource(`${import.meta.env.VITE_API_URL}/projects/${id}/events`);
+        source.onmessage = (event) => {
+            const { comments = [], resync, ...counts } = JSON.parse(event.data);
+            setProject((current) => {
+                if (!current) return current;
+                const known = new Set((current.comments || []).map((c) => c.id));
+                const fresh = comments.filter((c) => c.parent_id == null && !known.has(c.id));
+                return { ...current, ...counts, comments: [...(current.comments || []), ...fresh] };
+            });
+            if (resync) setThread(null); // Missed comments; "View all" reloads the thread
+        };
+        return () => source.close();
+    }, [id]);
+
     const handleLike = async () => {
         if (!user) {
             alert("Please login to like this project");
@@ -43,6 +63,20 @@ const ProjectDetail = () => {
         }
     };
 
+    const loadComments = async () => {
+        try {
+            const params = thread?.next_cursor ? { cursor: thread.next_cursor } : {};
+            const response = await axios.get(`${import.meta.env.VITE_API_URL}/projects/${id}/comments`, { params });
+            const page = response.data;
+            setThread({
+                items: [...(thread?.items || []), ...page.items.map((c) => ({ ...c, user: page.users[c.user_id] }))],
+                next_cursor: page.next_cursor
+            });
+        } catch (error) {
+            console.error('Error loading comments:', error);
+        }
+    };
+
     const handleCommentSubmit = async (e) => {
         e.preventDefault();
         if (!user) return;
@@ -58,7 +92,13 @@ const ProjectDetail = () => {
 
             // Add new comment to the list
             const newComment = { ...response.data, user: { username: user.username } };
-            setProject({ ...project, comments: [...(project.comments || []), newComment] });
+            // The live stream may have delivered this comment already
+            setProject((current) => (current.comments || []).some((c) => c.id === newComment.id) ? current : {
+                ...current, comments: [...(current.comments || []), newComment], comments_count: (current.comments_count || 0) + 1
+            });
+            if (thread && !thread.next_cursor) {
+                setThread({ ...thread, items: [...thread.items, newComment] });
+            }
             setComment('');
         } catch (error) {
             console.error('Error commenting:', error);
@@ -123,7 +163,7 @@ const ProjectDetail = () => {
                                 <svg xmlns="http://www.w3.org/2000/svg" className="h-8 w-8" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                                     <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M8 12h.01M12 12h.01M16 12h.01M21 12c0 4.418-4.03 8-9 8a9.863 9.863 0 01-4.255-.949L3 20l1.395-3.72C3.512 15.042 3 13.574 3 12c0-4.418 4.03-8 9-8s9 3.582 9 8z" />
                                 </svg>
-                                <span className="text-xl">{project.comments ? project.comments.length : 0}</span>
+                                <span className="text-xl">{project.comments_count || 0}</span>
                             </button>
                         </div>
                     </div>
@@ -137,7 +177,7 @@ const ProjectDetail = () => {
 
                     {/* Comments Section */}
                     <div className="border-t border-[var(--border-color)] pt-12">
-                        <h3 className="text-2xl font-bold mb-8 uppercase tracking-wide text-[var(--text-color)]">Comments ({project.comments ? project.comments.length : 0})</h3>
+                        <h3 className="text-2xl font-bold mb-8 uppercase tracking-wide text-[var(--text-color)]">Comments ({project.comments_count || 0})</h3>
 
                         {user ? (
                             <form onSubmit={handleCommentSubmit} className="mb-12">
@@ -163,7 +203,7 @@ const ProjectDetail = () => {
                         )}
 
                         <div className="space-y-8">
-                            {project.comments && project.comments.map((comment) => (
+                            {(thread ? thread.items : project.comments || []).map((comment) => (
                                 <div key={comment.id} className="flex space-x-4">
                                     <div className="w-10 h-10 rounded-full bg-gray-700 flex items-center justify-center font-bold text-[var(--text-muted)] flex-shrink-0">
                                         {comment.user?.username?.[0]?.toUpperCase() || 'U'}
@@ -178,6 +218,13 @@ const ProjectDetail = () => {
                                 </div>
                             ))}
                         </div>
+                        {(thread ? thread.next_cursor : (project.comments_count || 0) > (project.comments || []).length) && (
+                            <div className="mt-8 text-center">
+                                <button onClick={loadComments} className="text-primary hover:text-secondary font-medium">
+                                    {thread ? 'Load more comments' : `View all ${project.comments_count} comments`}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 </motion.div>
             </article>
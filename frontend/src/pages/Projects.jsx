@@ -3,13 +3,16 @@ import { motion } from 'framer-motion';
 import axios from 'axios';
 import { Link } from 'react-router-dom';
 
+const SORTS = [['recent', 'Latest'], ['popular', 'Popular']];
+
 const Projects = () => {
     const [projects, setProjects] = useState([]);
+    const [sort, setSort] = useState('recent');
 
     useEffect(() => {
         const fetchProjects = async () => {
             try {
-                const response = await axios.get(`${import.meta.env.VITE_API_URL}/projects/`);
+                const response = await axios.get(`${import.meta.env.VITE_API_URL}/projects/`, { params: { sort } });
                 setProjects(response.data);
             } catch (error) {
                 console.error('Error fetching projects:', error);
@@ -21,7 +24,7 @@ const Projects = () => {
             }
         };
         fetchProjects();
-    }, []);
+    }, [sort]);
 
     return (
         <div className="min-h-screen pt-24 pb-12 px-4 sm:px-6 lg:px-8 bg-[var(--bg-color)] text-[var(--text-color)] transition-colors duration-300">
@@ -29,10 +32,21 @@ const Projects = () => {
                 <motion.h2
                     initial={{ opacity: 0, y: -20 }}
                     animate={{ opacity: 1, y: 0 }}
-                    className="text-4xl font-bold text-center mb-12 uppercase tracking-wide text-[var(--text-color)]"
+                    className="text-4xl font-bold text-center mb-6 uppercase tracking-wide text-[var(--text-color)]"
                 >
                     My Projects
                 </motion.h2>
+                <div className="flex justify-center space-x-6 mb-12 text-sm uppercase tracking-wide">
+                    {SORTS.map(([value, label]) => (
+                        <button
+                            key={value}
+                            onClick={() => setSort(value)}
+                            className={`transition-colors ${sort === value ? 'text-primary font-bold' : 'text-[var(--text-muted)] hover:text-[var(--text-color)]'}`}
+                        >
+                            {label}
+                        </button>
+                    ))}
+                </div>
                 <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-8">
                     {projects.map((project, index) => (
                         <motion.div